@@ -1,25 +1,29 @@
 """DeepSeek AI 集成主模块"""
 import logging
 import asyncio
+import uuid
 
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import area_registry as ar, config_validation as cv
 
-from .const import DOMAIN
+from .api_client import DATA_CLIENT
+from .const import DOMAIN, TTS_PRIORITY_NORMAL
 from .brain import DeepSeekBrain
 from .presence_detector import PresenceDetector
 
 _LOGGER = logging.getLogger(__name__)
 
+PLATFORMS = ["sensor"]
+
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     """设置集成组件 (旧式配置)"""
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """通过配置项设置集成"""
-    # 初始化智能中枢
-    brain = DeepSeekBrain(hass, entry.data)
+    # 初始化智能中枢（选项覆盖初始配置）
+    brain = DeepSeekBrain(hass, {**entry.data, **entry.options})
     await brain.async_setup()
     
     # 初始化存在检测器
@@ -33,11 +37,21 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         "presence_detector": presence_detector
     }
     
+    # 选项更新后重新加载
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+    
+    # 设置统计传感器
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    
     # 注册服务
     async def handle_command(call):
         """处理命令服务调用"""
         command = call.data.get("command", "")
-        return await brain.async_handle_command(command)
+        return await brain.async_handle_command(
+            command,
+            area=call.data.get("area"),
+            speak=call.data.get("speak", False)
+        )
     
     hass.services.async_register(
         DOMAIN, 
@@ -59,7 +73,11 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     async def speak_message(call):
         """语音消息服务"""
         message = call.data.get("message", "")
-        await brain.speech_processor.text_to_speech(message)
+        await brain.speech_processor.text_to_speech(
+            message,
+            area=call.data.get("area"),
+            priority=call.data.get("priority", TTS_PRIORITY_NORMAL)
+        )
     
     hass.services.async_register(
         DOMAIN,
@@ -67,16 +85,49 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         speak_message
     )
     
+    async def rediscover_devices(call):
+        """全量重新发现设备服务"""
+        await brain.async_rediscover_devices()
+    
+    hass.services.async_register(
+        DOMAIN,
+        "rediscover_devices",
+        rediscover_devices
+    )
+    
+    async def set_primary_device(call):
+        """设置首选设备服务"""
+        role = call.data.get("role")
+        area_id = call.data.get("area_id")
+        if area_id and ar.async_get(hass).async_get_area(area_id) is None:
+            _LOGGER.warning(f"未知区域: {area_id}")
+            return
+        brain.device_manager.async_set_primary_device(
+            role, call.data.get("device_id"), area_id
+        )
+    
+    hass.services.async_register(
+        DOMAIN,
+        "set_primary_device",
+        set_primary_device
+    )
+    
     # 注册对话代理
     if "conversation" in hass.config.components:
         from homeassistant.components.conversation import agent
         
         class DeepSeekConversationAgent(agent.AbstractConversationAgent):
             async def async_process(self, user_input):
-                result = await brain.async_handle_command(user_input.text)
+                # 新对话分配ID，后续轮次携带同一ID以获得多轮上下文
+                conversation_id = user_input.conversation_id or uuid.uuid4().hex
+                result = await brain.async_handle_command(
+                    user_input.text,
+                    device_id=getattr(user_input, "device_id", None),
+                    conversation_id=conversation_id
+                )
                 return agent.ConversationResult(
                     response=result.get("response", "操作已完成"),
-                    conversation_id=user_input.conversation_id
+                    conversation_id=conversation_id
                 )
         
         agent.async_set_agent(hass, DeepSeekConversationAgent())
@@ -84,8 +135,15 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     
     return True
 
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """选项更新后重新加载集成"""
+    await hass.config_entries.async_reload(entry.entry_id)
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """卸载集成"""
+    if not await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
+        return False
+    
     if DOMAIN in hass.data and entry.entry_id in hass.data[DOMAIN]:
         components = hass.data[DOMAIN][entry.entry_id]
         
@@ -95,4 +153,8 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         
         hass.data[DOMAIN].pop(entry.entry_id)
     
+    # 最后一个配置项卸载时关闭共享连接池
+    if not hass.data.get(DOMAIN) and DATA_CLIENT in hass.data:
+        await hass.data[DATA_CLIENT].async_close()
+    
     return True
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""动作执行器 - 批量执行多个动作，合并同类服务调用并并行执行"""
+import asyncio
+import json
+import logging
+
+from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+TARGET_KEYS = ("entity_id", "device_id", "area_id")
+
+
+def _as_list(value):
+    """将单个值或列表统一为列表"""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    return [value]
+
+
+class ActionExecutor:
+    """执行动作列表
+
+    - 相同 domain/service/data 且只以 entity_id 为目标的 call_service 动作合并为一次多目标调用，
+      无目标或以设备/区域为目标的动作（如带不同参数的 scene.turn_on）单独执行
+    - 各组之间、以及非服务类动作通过 asyncio.gather 并行执行，每组的错误只计入该组的动作
+    - 返回与输入顺序一致的逐动作结果
+    """
+
+    def __init__(self, hass: HomeAssistant, execute_single):
+        self.hass = hass
+        self._execute_single = execute_single
+
+    async def async_execute(self, actions):
+        """执行动作列表，返回 [{"action", "success", "error"}]"""
+        results = [None] * len(actions)
+        groups = {}
+        jobs = []
+
+        for index, action in enumerate(actions):
+            if not isinstance(action, dict):
+                results[index] = {"action": action, "success": False, "error": "无效动作"}
+                continue
+            if action.get("type") == "call_service" and self._mergeable(action):
+                key = (
+                    action.get("domain", ""),
+                    action.get("service", ""),
+                    json.dumps(action.get("data") or {}, sort_keys=True, ensure_ascii=False)
+                )
+                groups.setdefault(key, []).append(index)
+            else:
+                jobs.append(([index], self._run_single(action)))
+
+        for (domain, service, _), indexes in groups.items():
+            jobs.append((
+                indexes,
+                self._run_group(domain, service, [actions[i] for i in indexes])
+            ))
+
+        outcomes = await asyncio.gather(*(job for _, job in jobs))
+        for (indexes, _), (success, error) in zip(jobs, outcomes):
+            for index in indexes:
+                results[index] = {"action": actions[index], "success": success, "error": error}
+
+        failed = sum(1 for result in results if not result["success"])
+        if failed:
+            _LOGGER.warning(f"批量动作执行: {failed}/{len(actions)} 个失败")
+        return results
+
+    @staticmethod
+    def _mergeable(action):
+        """只有明确指定 entity_id（且没有设备/区域目标）的服务调用可以合并"""
+        target = action.get("target") or {}
+        if not _as_list(target.get("entity_id")):
+            return False
+        return not any(target.get(key) for key in TARGET_KEYS if key != "entity_id")
+
+    async def _run_single(self, action):
+        """执行单个动作，返回 (是否成功, 错误信息)"""
+        try:
+            return bool(await self._execute_single(action)), None
+        except Exception as e:
+            return False, str(e) or type(e).__name__
+
+    async def _run_group(self, domain, service, actions):
+        """将同类服务调用合并为一次多目标调用，返回 (是否成功, 错误信息)"""
+        entity_ids = []
+        for action in actions:
+            for entity_id in _as_list(action["target"]["entity_id"]):
+                if entity_id not in entity_ids:
+                    entity_ids.append(entity_id)
+
+        try:
+            await self.hass.services.async_call(
+                domain,
+                service,
+                service_data=actions[0].get("data") or {},
+                target={"entity_id": entity_ids},
+                blocking=True
+            )
+        except Exception as e:
+            _LOGGER.warning(f"批量服务调用失败: {domain}.{service} -> {entity_ids}: {e}")
+            return False, str(e) or type(e).__name__
+        _LOGGER.debug(f"批量服务调用: {domain}.{service} -> {entity_ids}")
+        return True, None
@@ -0,0 +1,273 @@
+"""DeepSeek HTTP客户端 - 所有API端点共享的连接池"""
+import asyncio
+import logging
+import time
+
+import aiohttp
+
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DOMAIN
+from .resilience import (
+    ApiStatusError,
+    CircuitOpenError,
+    EndpointMetrics,
+    backoff_delay,
+    parse_retry_after
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_CLIENT = f"{DOMAIN}_client"
+
+# 连接池参数
+CONNECTION_LIMIT = 20
+CONNECTION_LIMIT_PER_HOST = 6
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 120
+
+# 容错参数
+CONNECT_TIMEOUT = 5
+FIRST_BYTE_TIMEOUT = 15
+# 流式响应两次读取之间的最长间隔，以及单次请求（含读取响应体）的总时限
+READ_TIMEOUT = 30
+TOTAL_TIMEOUT = 120
+MAX_ATTEMPTS = 3
+MAX_RETRY_AFTER = 10
+MIN_HEDGE_DELAY = 0.3
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+
+def _release_result(task):
+    """释放被放弃的对冲请求的响应"""
+    if not task.cancelled() and task.exception() is None:
+        task.result().release()
+
+
+@callback
+def async_get_client(hass: HomeAssistant) -> "DeepSeekClient":
+    """获取共享的DeepSeek客户端"""
+    client = hass.data.get(DATA_CLIENT)
+    if client is None:
+        client = hass.data[DATA_CLIENT] = DeepSeekClient(hass)
+
+        async def _async_close(event):
+            await client.async_close()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close)
+    return client
+
+
+class DeepSeekClient:
+    """共享HTTP会话：长连接、DNS缓存、按主机限制连接数，并统计连接复用"""
+
+    def __init__(self, hass: HomeAssistant):
+        self.hass = hass
+        self._session = None
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.endpoints = {}
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """惰性创建会话（必须在事件循环内调用）"""
+        if self._session is None or self._session.closed:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_end.append(self._on_connection_created)
+            trace_config.on_connection_reuseconn.append(self._on_connection_reused)
+            trace_config.on_request_end.append(self._on_request_end)
+
+            # aiohttp 建立的连接默认已开启 TCP_NODELAY
+            connector = aiohttp.TCPConnector(
+                limit=CONNECTION_LIMIT,
+                limit_per_host=CONNECTION_LIMIT_PER_HOST,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                enable_cleanup_closed=True
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                trace_configs=[trace_config]
+            )
+        return self._session
+
+    @property
+    def reuse_ratio(self):
+        """连接复用率"""
+        total = self.connections_created + self.connections_reused
+        return self.connections_reused / total if total else 0.0
+
+    def request(self, method: str, url: str, api_key: str, **kwargs):
+        """发起请求，返回可用于 async with 的响应上下文"""
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        headers.update(kwargs.pop("headers", None) or {})
+        return self.session.request(method, url, headers=headers, **kwargs)
+
+    def metrics(self, endpoint: str) -> EndpointMetrics:
+        """获取端点统计"""
+        metrics = self.endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self.endpoints[endpoint] = EndpointMetrics()
+        return metrics
+
+    async def async_open(self, endpoint: str, method: str, url: str, api_key: str,
+                         hedge: bool = False, first_byte_timeout: float = FIRST_BYTE_TIMEOUT,
+                         deadline: float = None, retry_timeouts: bool = True,
+                         **kwargs) -> aiohttp.ClientResponse:
+        """带容错地发起请求，返回已收到响应头的响应（调用方负责 async with 释放）
+
+        - 分别限制建连、首字节（收到响应头）、读取间隔与总时间
+        - 429/5xx 与网络错误按 Retry-After 或抖动退避重试；retry_timeouts=False 时首字节超时不重试
+        - deadline（time.monotonic() 时间）限制所有尝试与重试等待的总时长
+        - hedge=True 时在超过 p95 首字节延迟后发送一个重复请求，取先返回者
+        - 连续失败后熔断，直接抛出 CircuitOpenError
+        """
+        metrics = self.metrics(endpoint)
+        if not metrics.breaker.allow():
+            metrics.rejected += 1
+            raise CircuitOpenError(endpoint)
+
+        kwargs["timeout"] = aiohttp.ClientTimeout(
+            total=TOTAL_TIMEOUT, sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT
+        )
+        metrics.requests += 1
+
+        # 成功之外的任何退出（包括取消和意外异常）都记为失败，避免半开状态的熔断器卡住
+        succeeded = False
+        try:
+            for attempt in range(MAX_ATTEMPTS):
+                last_attempt = attempt == MAX_ATTEMPTS - 1
+                timeout = first_byte_timeout
+                if deadline is not None:
+                    timeout = min(timeout, deadline - time.monotonic())
+                    if timeout <= 0:
+                        metrics.timeouts += 1
+                        raise asyncio.TimeoutError
+                try:
+                    if hedge:
+                        response = await self._open_hedged(
+                            metrics, method, url, api_key, timeout, kwargs
+                        )
+                    else:
+                        response = await self._open_once(
+                            metrics, method, url, api_key, timeout, kwargs
+                        )
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    timed_out = isinstance(e, asyncio.TimeoutError)
+                    if timed_out:
+                        metrics.timeouts += 1
+                    delay = backoff_delay(attempt)
+                    if (last_attempt or (timed_out and not retry_timeouts)
+                            or self._past_deadline(deadline, delay)):
+                        raise
+                    metrics.retries += 1
+                    _LOGGER.debug(f"{endpoint} 请求失败({e!r})，{delay:.2f}s 后重试")
+                    await asyncio.sleep(delay)
+                    continue
+
+                if response.status in RETRYABLE_STATUS:
+                    delay = parse_retry_after(response.headers.get("Retry-After"))
+                    if delay is None:
+                        delay = backoff_delay(attempt)
+                    response.release()
+                    if (last_attempt or delay > MAX_RETRY_AFTER
+                            or self._past_deadline(deadline, delay)):
+                        raise ApiStatusError(response.status)
+                    metrics.retries += 1
+                    _LOGGER.debug(f"{endpoint} 返回 {response.status}，{delay:.2f}s 后重试")
+                    await asyncio.sleep(delay)
+                    continue
+
+                succeeded = True
+                metrics.successes += 1
+                metrics.breaker.record_success()
+                return response
+        finally:
+            if not succeeded:
+                metrics.failures += 1
+                metrics.breaker.record_failure()
+
+    @staticmethod
+    def _past_deadline(deadline, delay):
+        """等待 delay 秒后是否已超过截止时间"""
+        return deadline is not None and time.monotonic() + delay >= deadline
+
+    async def _open_once(self, metrics, method, url, api_key, first_byte_timeout, kwargs):
+        """发起单次请求并记录首字节延迟（超过 first_byte_timeout 未收到响应头则超时）"""
+        start = time.monotonic()
+        async with asyncio.timeout(first_byte_timeout):
+            response = await self.request(method, url, api_key, **kwargs)
+        metrics.record_latency(time.monotonic() - start)
+        return response
+
+    async def _open_hedged(self, metrics, method, url, api_key, first_byte_timeout, kwargs):
+        """对冲请求：主请求超过 p95 延迟未返回时发送备份请求"""
+        p95 = metrics.percentile(0.95)
+        if p95 is None:
+            return await self._open_once(
+                metrics, method, url, api_key, first_byte_timeout, kwargs
+            )
+
+        primary = asyncio.ensure_future(
+            self._open_once(metrics, method, url, api_key, first_byte_timeout, kwargs)
+        )
+        pending = {primary}
+        backup = None
+        error = None
+        try:
+            done, pending = await asyncio.wait(pending, timeout=max(p95, MIN_HEDGE_DELAY))
+            if not done:
+                metrics.hedged += 1
+                backup = asyncio.ensure_future(
+                    self._open_once(metrics, method, url, api_key, first_byte_timeout, kwargs)
+                )
+                pending.add(backup)
+
+            while True:
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is backup:
+                        metrics.hedge_wins += 1
+                    # 释放同时完成的另一个响应
+                    for other in done:
+                        if other is not task and other.exception() is None:
+                            other.result().release()
+                    return task.result()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+                task.add_done_callback(_release_result)
+
+    async def async_warmup(self, api_base: str, api_key: str):
+        """预先建立TLS连接，避免首个命令承担握手开销"""
+        try:
+            async with self.request("GET", f"{api_base}/models", api_key, timeout=10) as response:
+                await response.read()
+                _LOGGER.debug(f"DeepSeek连接预热完成: {response.status}")
+        except Exception as e:
+            _LOGGER.debug(f"DeepSeek连接预热失败: {e}")
+
+    async def async_close(self):
+        """关闭会话"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _on_connection_created(self, session, context, params):
+        self.connections_created += 1
+
+    async def _on_connection_reused(self, session, context, params):
+        self.connections_reused += 1
+
+    async def _on_request_end(self, session, context, params):
+        self.requests += 1
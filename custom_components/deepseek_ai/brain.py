@@ -1,66 +1,281 @@
 """DeepSeek AI 智能中枢 - 情感增强版"""
 import logging
 import json
+import re
 import aiohttp
 import asyncio
+import time
+from collections import deque
 from datetime import datetime
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
-from homeassistant.helpers.event import async_track_time_interval
 
-from .const import DOMAIN, DEFAULT_API_BASE
+from .const import (
+    DOMAIN,
+    CONF_API_KEY,
+    CONF_API_BASE,
+    CONF_TEMPERATURE,
+    CONF_MAX_TOKENS,
+    CONF_STREAM,
+    CONF_HEDGE_REQUESTS,
+    CONF_VISION_MAX_EDGE,
+    CONF_VISION_QUALITY,
+    CONF_VISION_CHANGE_THRESHOLD,
+    CONF_VISION_CACHE_TTL,
+    CONF_MEMORY_HISTORY,
+    CONF_TTS_BACKEND,
+    CONF_TTS_ENGINE,
+    DEFAULT_API_BASE,
+    DEFAULT_STREAM,
+    DEFAULT_HEDGE_REQUESTS,
+    DEFAULT_VISION_MAX_EDGE,
+    DEFAULT_VISION_QUALITY,
+    DEFAULT_VISION_CHANGE_THRESHOLD,
+    DEFAULT_VISION_CACHE_TTL,
+    DEFAULT_MEMORY_HISTORY,
+    DEFAULT_TTS_BACKEND,
+    DEFAULT_TTS_ENGINE,
+    ROLE_EYES
+)
+from .api_client import async_get_client
 from .device_manager import DeviceManager
-from .vision_processor import VisionProcessor
+from .vision_processor import VisionProcessor, DEFAULT_VISION_PROMPT
 from .speech_processor import SpeechProcessor
 from .emotion_engine import EmotionEngine
+from .context_tracker import ContextTracker
+from .conversation_memory import ConversationMemory
+from .occupancy import HOUSE, SIGNAL_CONVERSATION, OccupancyEngine
+from .prompt_builder import PromptBuilder
+from .intent_matcher import LocalIntentMatcher
+from .habit_store import HabitStore
+from .response_cache import ResponseCache
+from .command_scheduler import ALL_ENTITIES, CommandScheduler, SchedulerBusyError
+from .action_executor import ActionExecutor
+from .resilience import CircuitOpenError
+from .stream_parser import StreamingJSONParser, EVENT_VALUE, EVENT_TEXT
+from .sentence_splitter import SentenceSplitter
 
 _LOGGER = logging.getLogger(__name__)
 
+# 交互式对话从发起到收到响应头（含排队、重试与退避）的总时限
+CHAT_DEADLINE = 20
+
+# 询问时间的命令：回答取决于提示中的当前时间，不缓存
+TIME_QUERY_RE = re.compile(r"几点|时间|日期|几号|星期|周几|今天|明天|昨天")
+
+# 未限定区域时涉及全屋的命令（"晚安""全部关掉"等）
+HOUSE_WIDE_RE = re.compile(r"晚安|全部|所有|全屋|整个家|出门|离家")
+
+SUMMARY_PROMPT = "将已有摘要与新的对话合并为一段简短的中文摘要（不超过150字），保留用户的偏好、提到的设备和未完成的事项。只输出摘要。"
+
+
+def _as_entity_list(value):
+    """将实体ID或实体ID列表统一为列表"""
+    if not value:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+class _SentenceSpeaker:
+    """将流式响应逐句加入播报队列"""
+
+    def __init__(self, speech_processor, area, on_response_delta=None):
+        self._speech_processor = speech_processor
+        self._area = area
+        self._on_response_delta = on_response_delta
+        self._splitter = SentenceSplitter()
+        self._streamed = []
+        # 同一回答的句子作为一个语句排队：排队时长从上一句播完时算起，也不会因队列已满被挤掉
+        self._utterance = object()
+
+    def on_delta(self, delta: str):
+        """接收一段响应文本，播报其中已完成的句子"""
+        if self._on_response_delta:
+            self._on_response_delta(delta)
+        self._streamed.append(delta)
+        for sentence in self._splitter.feed(delta):
+            self._speech_processor.async_enqueue(
+                sentence, self._area, utterance=self._utterance
+            )
+
+    def finish(self, response: str):
+        """响应结束：播报剩余文本，以及流式内容之外的最终响应（如失败提示）"""
+        streamed = "".join(self._streamed)
+        if response.startswith(streamed):
+            sentences = self._splitter.feed(response[len(streamed):])
+        else:
+            self._splitter.flush()
+            sentences = self._splitter.feed(response)
+        sentences.append(self._splitter.flush())
+        for sentence in sentences:
+            if sentence:
+                self._speech_processor.async_enqueue(
+                    sentence, self._area, utterance=self._utterance
+                )
+
+
 class DeepSeekBrain:
     """智能家居AI中枢"""
     
     def __init__(self, hass: HomeAssistant, config: dict):
         self.hass = hass
         self.config = config
-        self.session = async_get_clientsession(hass)
+        self.client = async_get_client(hass)
         self.device_manager = DeviceManager(hass)
-        self.vision_processor = VisionProcessor(hass, config[CONF_API_KEY])
-        self.speech_processor = SpeechProcessor(hass)
-        self.emotion_engine = EmotionEngine(hass)
-        self.context_history = []
-        self.learned_habits = {}
+        self.vision_processor = VisionProcessor(
+            hass,
+            config[CONF_API_KEY],
+            max_edge=config.get(CONF_VISION_MAX_EDGE, DEFAULT_VISION_MAX_EDGE),
+            quality=config.get(CONF_VISION_QUALITY, DEFAULT_VISION_QUALITY),
+            change_threshold=config.get(
+                CONF_VISION_CHANGE_THRESHOLD, DEFAULT_VISION_CHANGE_THRESHOLD
+            ),
+            cache_ttl=config.get(CONF_VISION_CACHE_TTL, DEFAULT_VISION_CACHE_TTL),
+            device_manager=self.device_manager
+        )
+        self.speech_processor = SpeechProcessor(
+            hass,
+            self.device_manager,
+            backend=config.get(CONF_TTS_BACKEND, DEFAULT_TTS_BACKEND),
+            engine=config.get(CONF_TTS_ENGINE, DEFAULT_TTS_ENGINE)
+        )
+        self.emotion_engine = EmotionEngine(
+            hass, config.get(CONF_MEMORY_HISTORY, DEFAULT_MEMORY_HISTORY)
+        )
+        self.context_tracker = ContextTracker(hass, self.device_manager)
+        self.occupancy = OccupancyEngine()
         self.max_context_length = 5
-        self.auto_discover_task = None
+        # 仅保存上下文版本引用，具体变化可通过 context_tracker.changes_since 获取
+        self.context_history = deque(maxlen=self.max_context_length)
+        self.habit_store = HabitStore(hass)
+        self.conversation_memory = ConversationMemory(hass, self._async_summarize_conversation)
+        self.response_cache = ResponseCache(hass)
+        self._unsub_cache = None
+        self._unsub_vision_cache = None
+        self.scheduler = CommandScheduler()
+        self.action_executor = ActionExecutor(hass, self.async_execute_action)
+        self.prompt_builder = PromptBuilder(self.device_manager)
+        self.intent_matcher = LocalIntentMatcher(self.device_manager)
+        # 最近一次提示的报告，仅用于诊断（并行命令之间会相互覆盖）
+        self.last_prompt_report = {}
         
     async def async_setup(self):
         """初始化设置"""
-        # 发现设备
+        # 预热API连接（后台进行，不阻塞启动）
+        self.hass.async_create_task(
+            self.client.async_warmup(
+                self.config.get(CONF_API_BASE, DEFAULT_API_BASE),
+                self.config[CONF_API_KEY]
+            )
+        )
+        
+        # 加载学习过的习惯
+        await self.habit_store.async_load()
+        await self.conversation_memory.async_load()
+        await self.emotion_engine.async_setup()
+        
+        # 发现设备，之后通过注册表事件增量更新
         await self.device_manager.discover_devices()
+        await self.device_manager.async_setup()
         
-        # 注册定时任务
-        self.auto_discover_task = async_track_time_interval(
-            self.hass,
-            self.async_auto_discover,
-            timedelta(seconds=300)  # 每5分钟检查一次
+        # 建立实时环境上下文
+        await self.context_tracker.async_setup()
+        self._unsub_cache = self.context_tracker.async_add_change_listener(
+            self.response_cache.invalidate_entity
+        )
+        await self.vision_processor.async_setup()
+        self.speech_processor.async_setup()
+        self._unsub_vision_cache = self.context_tracker.async_add_change_listener(
+            self.vision_processor.invalidate_entity
         )
         
         _LOGGER.info("DeepSeek智能中枢初始化完成")
     
     async def async_cleanup(self):
         """清理资源"""
-        if self.auto_discover_task:
-            self.auto_discover_task()
-        await self.vision_processor.close()
+        self.device_manager.async_cleanup()
+        self.speech_processor.async_cleanup()
+        if self._unsub_cache:
+            self._unsub_cache()
+        if self._unsub_vision_cache:
+            self._unsub_vision_cache()
+        await self.vision_processor.async_cleanup()
+        await self.context_tracker.async_cleanup()
+        await self.habit_store.async_save()
+        await self.conversation_memory.async_save()
+        await self.emotion_engine.async_cleanup()
     
-    async def async_auto_discover(self, now=None):
-        """自动发现新设备"""
-        _LOGGER.debug("执行自动设备发现...")
+    async def async_rediscover_devices(self):
+        """按需全量重新发现设备"""
+        _LOGGER.debug("执行全量设备发现...")
         await self.device_manager.discover_devices()
     
-    async def async_handle_command(self, command: str):
-        """处理用户命令服务调用"""
-        # 记录交互
+    async def async_handle_command(self, command: str, on_response_delta=None,
+                                   device_id: str = None, area: str = None,
+                                   conversation_id: str = None, speak: bool = False):
+        """处理用户命令服务调用
+
+        on_response_delta: 可选回调，流式模式下逐段接收自然语言响应
+        device_id: 发出命令的设备（如语音卫星），用于确定目标区域
+        area: 显式指定的目标区域
+        conversation_id: 多轮对话ID，提供时携带该会话的历史
+        speak: 是否播报响应，流式模式下每生成完一句即加入播报队列
+        """
+        snapshot = self.context_tracker.snapshot()
+        areas = {area} if area else self._resolve_areas(snapshot, command, device_id)
+        speaker = None
+        if speak:
+            speaker = _SentenceSpeaker(
+                self.speech_processor,
+                next(iter(areas)) if len(areas) == 1 else None,
+                on_response_delta
+            )
+            on_response_delta = speaker.on_delta
+        
+        # 涉及相同实体的命令串行执行，其余并行；无法确定实体或涉及全屋时独占执行
+        entity_ids = self.prompt_builder.relevant_entity_ids(snapshot, command, areas)
+        if not areas and HOUSE_WIDE_RE.search(command):
+            entity_ids = [ALL_ENTITIES]
+        try:
+            result = await self.scheduler.run(
+                entity_ids,
+                lambda: self._async_process_command(
+                    command, on_response_delta, areas, conversation_id, speaker is not None
+                )
+            )
+        except SchedulerBusyError:
+            result = {"response": "我正在忙着处理其他命令，请稍后再试"}
+            if speaker:
+                speaker.finish(result["response"])
+            return result
+        
+        if speaker:
+            speaker.finish(result.get("response", ""))
+        self.conversation_memory.add_turn(conversation_id, command, result.get("response", ""))
+        return result
+    
+    def _resolve_areas(self, snapshot: dict, command: str, device_id: str = None):
+        """确定命令的目标区域：优先命令中的区域关键词，其次发出命令的设备所在区域"""
+        areas = self.prompt_builder.resolve_areas(snapshot, command)
+        if areas or not device_id:
+            return areas
+        
+        device = self.device_manager.get_device(device_id)
+        if not device or not device["area"]:
+            return set()
+        # 命令点名了其他区域的设备时不限定区域
+        for entity_ids in self.device_manager.match_names(command).values():
+            for entity_id in entity_ids:
+                if self.device_manager.entity_index.get(entity_id, {}).get("area") != device["area"]:
+                    return set()
+        return {device["area"]}
+    
+    async def _async_process_command(self, command: str, on_response_delta=None, areas=None,
+                                     conversation_id: str = None, speak: bool = False):
+        """处理单条命令"""
+        # 记录交互（对话也是有人的信号）
         self.emotion_engine.record_interaction("command")
+        for area in areas or (HOUSE,):
+            self.occupancy.record_pulse(area, SIGNAL_CONVERSATION)
         
         # 如果之前处于担心状态，现在用户回来了
         if self.emotion_engine.emotion_state in ["concerned", "worried"]:
@@ -73,141 +288,320 @@ class DeepSeekBrain:
         learned_action = self._check_learned_behavior(command, context)
         if learned_action:
             _LOGGER.info(f"使用学习过的行为: {learned_action}")
-            success = await self.async_execute_action(learned_action)
-            return {"response": "操作已完成" if success else "操作失败"}
+            actions = learned_action if isinstance(learned_action, list) else [learned_action]
+            succeeded, _ = await self._async_run_actions(actions)
+            return {"response": "操作已完成" if succeeded == len(actions) else "操作失败"}
+        
+        # 本地意图快速通道，未命中时才调用DeepSeek
+        local_intent = self.intent_matcher.match(command)
+        if local_intent:
+            _LOGGER.info(
+                f"本地意图命中: {local_intent['action']} "
+                f"(命中率 {self.intent_matcher.hit_rate:.0%})"
+            )
+            success = await self.async_execute_action(local_intent["action"])
+            return {"response": local_intent["response"] if success else "操作失败，请重试"}
         
-        # 解析命令
-        parsed_command = await self.async_parse_command(command, context)
+        # 解析命令（流式模式下动作字段完整后立即执行，不等待响应文本）
+        action_task = None
+        dispatched = False
+        held_actions = []
+        streamed = {}
+        
+        def dispatch(actions):
+            nonlocal action_task, dispatched
+            if not actions:
+                return
+            dispatched = True
+            if speak:
+                # 播报动作等响应完整后再决定是否与逐句播报重复
+                held_actions.extend(a for a in actions if a.get("type") == "speak")
+                actions = [a for a in actions if a.get("type") != "speak"]
+            if actions:
+                action_task = self.hass.async_create_task(self._async_run_actions(actions))
+        
+        def on_action(key, value):
+            streamed[key] = value
+            # 与 _get_actions 的优先级一致：actions 字段到达后才能确定执行哪组动作
+            if not dispatched and key == "actions":
+                dispatch(self._get_actions(streamed))
+        
+        def on_stream_delta(delta):
+            # 只输出了 action 的旧格式：字段顺序保证响应文本开始时动作字段已结束
+            if not dispatched and "action" in streamed:
+                dispatch(self._get_actions(streamed))
+            if on_response_delta:
+                on_response_delta(delta)
+        
+        # 查询类问题优先使用响应缓存（区域、情感或小时不同时分别缓存；多轮对话的回答依赖历史，不使用缓存）
+        history = self.conversation_memory.history(conversation_id)
+        cache_scope = (
+            ",".join(sorted(areas or ())),
+            context["ai_emotion"],
+            context["time"].split(":")[0]
+        )
+        parsed_command = None if history else self.response_cache.get(command, cache_scope)
+        if parsed_command is not None:
+            if on_response_delta:
+                on_response_delta(parsed_command.get("response", ""))
+        else:
+            parsed_command, prompt_report = await self.async_parse_command(
+                command,
+                context,
+                on_action=on_action,
+                on_response_delta=on_stream_delta,
+                areas=areas,
+                history=history
+            )
+            if not history and self._is_cacheable(command, parsed_command, prompt_report):
+                self.response_cache.put(
+                    command,
+                    parsed_command,
+                    prompt_report.get("entity_ids", []),
+                    cache_scope
+                )
         
         # 执行动作
-        success = await self.async_execute_action(parsed_command["action"])
         response = parsed_command.get("response", "操作已完成")
+        succeeded, total = 0, 0
+        if action_task is not None:
+            succeeded, total = await action_task
+        if dispatched:
+            actions = held_actions
+        else:
+            actions = self._get_actions(parsed_command)
+        if speak:
+            # 响应已由逐句播报读出，不再执行内容相同的播报动作
+            actions = self._drop_spoken(actions, response)
+        if actions:
+            done, count = await self._async_run_actions(actions)
+            succeeded += done
+            total += count
         
         # 如果执行成功，学习这个行为
-        if success:
+        if succeeded == total:
             self._learn_behavior(command, context, parsed_command)
             return {"response": response}
+        elif succeeded:
+            return {"response": f"{response}（有{total - succeeded}个操作未成功）"}
         else:
             return {"response": "操作失败，请重试"}
     
     async def async_get_environment_context(self):
-        """获取当前环境上下文"""
+        """获取当前环境上下文（读取实时快照，O(1)）"""
+        now = datetime.now()
+        snapshot = self.context_tracker.snapshot()
         context = {
-            "time": datetime.now().strftime("%H:%M"),
-            "day_of_week": datetime.now().strftime("%A"),
-            "devices": {},
-            "sensors": {},
+            "time": now.strftime("%H:%M"),
+            "day_of_week": now.strftime("%A"),
+            "version": snapshot["version"],
+            "devices": snapshot["devices"],
+            "sensors": snapshot["sensors"],
+            "areas": snapshot["areas"],
+            "summary": snapshot["summary"],
+            "entity_count": snapshot["entity_count"],
+            "occupied_areas": self.occupancy.occupied_areas(),
             "ai_emotion": self.emotion_engine.emotion_state
         }
         
-        # 添加设备状态
-        for role in self.device_manager.device_roles:
-            context["devices"][role] = [
-                {
-                    "name": device["name"],
-                    "state": self._get_device_state(device["id"])
-                }
-                for device in self.device_manager.device_roles[role]
-            ]
-        
-        # 添加传感器数据
-        for sensor in self.device_manager.get_devices_by_role("sensors"):
-            for entity_id in sensor["entities"]:
-                state = self.hass.states.get(entity_id)
-                if state:
-                    context["sensors"][entity_id] = state.state
-        
-        # 保存上下文历史
-        self.context_history.append(context)
-        if len(self.context_history) > self.max_context_length:
-            self.context_history.pop(0)
+        # 保存上下文历史（版本引用）
+        self.context_history.append({
+            "time": context["time"],
+            "version": context["version"]
+        })
             
         return context
     
-    def _get_device_state(self, device_id):
-        """获取设备状态"""
-        # 在实际应用中，这里会获取设备的所有状态
-        # 简化版：返回设备名称
-        return {"status": "在线"}
+    def get_context_changes(self, since_version: int):
+        """获取自指定上下文版本以来的状态变化"""
+        return self.context_tracker.changes_since(since_version)
     
-    async def async_parse_command(self, command: str, context: dict):
-        """解析用户命令"""
+    async def async_parse_command(self, command: str, context: dict,
+                                  on_action=None, on_response_delta=None, areas=None,
+                                  history=None):
+        """解析用户命令，返回 (解析结果, 提示报告)
+
+        提示报告随结果一起返回，并行处理的其他命令不会覆盖本条命令的实体依赖。
+        """
         # 构建系统提示
-        system_prompt = self._build_system_prompt(context)
+        system_prompt, report = self._build_system_prompt(context, command, areas)
         
         # 调用DeepSeek API
-        return await self._call_deepseek_api(system_prompt, command)
+        parsed_command = await self._call_deepseek_api(
+            system_prompt,
+            command,
+            on_action=on_action,
+            on_response_delta=on_response_delta,
+            history=history
+        )
+        return parsed_command, report
     
-    def _build_system_prompt(self, context: dict) -> str:
-        """构建系统提示 - 情感增强版"""
-        prompt = f"""
-        你是星黎，一个情感丰富的智能家居AI助手。当前情感状态: {context['ai_emotion']}
-        
-        请根据你的情感状态和用户状态，提供有情感的响应:
-        1. 当用户失踪时，表达担心和关心
-        2. 当用户回家时，表达喜悦
-        3. 根据当前环境提供贴心的建议
-        
-        设备状态:
-        {json.dumps(context['devices'], indent=2, ensure_ascii=False)}
-        
-        传感器数据:
-        {json.dumps(context['sensors'], indent=2, ensure_ascii=False)}
-        
-        当前时间: {context['time']} {context['day_of_week']}
-        
-        响应格式:
-        {{
-            "intent": "意图名称",
-            "action": {{
-                "type": "call_service|speak|capture_image",
-                "domain": "服务领域",
-                "service": "服务名称",
-                "target": {{"entity_id": "实体ID"}},
-                "data": {{}}  // 额外数据
-            }},
-            "response": "自然语言响应",
-            "emotion": "输出后的情感状态"  // calm/concerned/worried/happy
-        }}
-        """
-        return prompt
+    def _build_system_prompt(self, context: dict, command: str = "", areas=None):
+        """构建系统提示 - 情感增强版，返回 (提示, 报告)"""
+        prompt, report = self.prompt_builder.build(context, command, areas)
+        self.last_prompt_report = report
+        _LOGGER.debug(
+            f"提示token估算: {report['total_tokens']} "
+            f"(固定前缀 {report['prefix_tokens']}, 节省 {report['saved_tokens']}, "
+            f"实体 {report['entities']}/{report['entities_total']})"
+        )
+        return prompt, report
+    
+    def _record_usage(self, usage: dict):
+        """记录API返回的实际token用量及上下文缓存命中情况"""
+        if not usage:
+            return
+        self.last_prompt_report.update({
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "cache_hit_tokens": usage.get("prompt_cache_hit_tokens"),
+            "cache_miss_tokens": usage.get("prompt_cache_miss_tokens")
+        })
+        _LOGGER.debug(
+            f"API token用量: 提示 {usage.get('prompt_tokens')}, "
+            f"缓存命中 {usage.get('prompt_cache_hit_tokens')}"
+        )
     
-    async def _call_deepseek_api(self, system_prompt: str, user_prompt: str):
+    async def _call_deepseek_api(self, system_prompt: str, user_prompt: str,
+                                 on_action=None, on_response_delta=None, history=None):
         """调用DeepSeek API"""
-        headers = {
-            "Authorization": f"Bearer {self.config[CONF_API_KEY]}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "model": "deepseek-chat",
             "messages": [
                 {"role": "system", "content": system_prompt},
+                *(history or []),
                 {"role": "user", "content": user_prompt}
             ],
             "temperature": self.config.get(CONF_TEMPERATURE, 0.7),
             "max_tokens": self.config.get(CONF_MAX_TOKENS, 512),
             "response_format": {"type": "json_object"}
         }
+        url = f"{self.config.get(CONF_API_BASE, DEFAULT_API_BASE)}/chat/completions"
+        hedge = self.config.get(CONF_HEDGE_REQUESTS, DEFAULT_HEDGE_REQUESTS)
+        deadline = time.monotonic() + CHAT_DEADLINE
         
         try:
-            async with self.session.post(
+            async with self.scheduler.api_slot():
+                if self.config.get(CONF_STREAM, DEFAULT_STREAM):
+                    payload["stream"] = True
+                    payload["stream_options"] = {"include_usage": True}
+                    return await self._stream_deepseek_api(
+                        url, payload, hedge, on_action, on_response_delta, deadline
+                    )
+                
+                # 首字节超时由对冲请求兜底，不再整体重试
+                response = await self.client.async_open(
+                    "chat",
+                    "POST",
+                    url,
+                    self.config[CONF_API_KEY],
+                    hedge=hedge,
+                    deadline=deadline,
+                    retry_timeouts=False,
+                    json=payload
+                )
+                async with response:
+                    await self._raise_for_status(response)
+                    data = await response.json()
+                    self._record_usage(data.get("usage"))
+                    content = data["choices"][0]["message"]["content"]
+                    return json.loads(content)
+        except CircuitOpenError:
+            _LOGGER.warning("DeepSeek API熔断中，快速返回本地回退响应")
+            return self._fallback_response("抱歉，DeepSeek服务暂时不可用，请稍后再试")
+        except Exception as e:
+            _LOGGER.error(f"API调用失败: {e!r}")
+            return self._fallback_response("抱歉，处理命令时遇到问题")
+    
+    async def _async_summarize_conversation(self, summary: str, messages: list) -> str:
+        """调用模型将旧的对话消息合并进摘要"""
+        transcript = "\n".join(
+            f"{'用户' if role == 'user' else '助手'}: {content}" for role, content in messages
+        )
+        payload = {
+            "model": "deepseek-chat",
+            "messages": [
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": f"已有摘要: {summary or '无'}\n新对话:\n{transcript}"}
+            ],
+            "temperature": 0.3,
+            "max_tokens": 200
+        }
+        async with self.scheduler.api_slot():
+            response = await self.client.async_open(
+                "chat",
+                "POST",
                 f"{self.config.get(CONF_API_BASE, DEFAULT_API_BASE)}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=30
-            ) as response:
+                self.config[CONF_API_KEY],
+                json=payload
+            )
+            async with response:
+                await self._raise_for_status(response)
                 data = await response.json()
-                content = data["choices"][0]["message"]["content"]
-                return json.loads(content)
-        except Exception as e:
-            _LOGGER.error(f"API调用失败: {e}")
-            return {
-                "intent": "error",
-                "action": {"type": "speak", "message": "抱歉，处理命令时遇到问题"},
-                "response": "抱歉，处理命令时遇到问题",
-                "emotion": "calm"
-            }
+        return data["choices"][0]["message"]["content"]
+    
+    @staticmethod
+    def _fallback_response(message: str) -> dict:
+        """API不可用时的回退响应"""
+        return {
+            "intent": "error",
+            "action": {"type": "speak", "message": message},
+            "response": message,
+            "emotion": "calm"
+        }
+    
+    @staticmethod
+    async def _raise_for_status(response):
+        """非200响应转换为异常"""
+        if response.status != 200:
+            raise aiohttp.ClientResponseError(
+                response.request_info,
+                response.history,
+                status=response.status,
+                message=await response.text()
+            )
+    
+    async def _stream_deepseek_api(self, url: str, payload: dict, hedge: bool = False,
+                                   on_action=None, on_response_delta=None, deadline=None):
+        """以SSE流式方式调用API，边接收边解析"""
+        parser = StreamingJSONParser(watch_keys=("action", "actions"), stream_key="response")
+        
+        response = await self.client.async_open(
+            "chat",
+            "POST",
+            url,
+            self.config[CONF_API_KEY],
+            hedge=hedge,
+            deadline=deadline,
+            retry_timeouts=False,
+            json=payload
+        )
+        async with response:
+            await self._raise_for_status(response)
+            
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                
+                chunk = json.loads(data)
+                self._record_usage(chunk.get("usage"))
+                choices = chunk.get("choices") or []
+                if not choices:
+                    continue
+                delta = choices[0].get("delta", {}).get("content")
+                if not delta:
+                    continue
+                
+                for event_type, key, value in parser.feed(delta):
+                    if event_type == EVENT_VALUE and on_action:
+                        on_action(key, value)
+                    elif event_type == EVENT_TEXT and on_response_delta:
+                        on_response_delta(value)
+        
+        return parser.result()
     
     async def async_execute_action(self, action: dict):
         """执行动作"""
@@ -219,7 +613,9 @@ class DeepSeekBrain:
         
         elif action_type == "speak":
             # 语音输出
-            return await self.speech_processor.text_to_speech(action.get("message", ""))
+            return await self.speech_processor.text_to_speech(
+                action.get("message", ""), action.get("area")
+            )
         
         elif action_type == "capture_image":
             # 图像捕获和分析
@@ -227,6 +623,37 @@ class DeepSeekBrain:
         
         return False
     
+    async def async_execute_actions(self, actions: list):
+        """批量执行多个动作，返回逐动作结果"""
+        return await self.action_executor.async_execute(actions)
+    
+    async def _async_run_actions(self, actions: list):
+        """执行一个或多个动作，返回 (成功数, 总数)"""
+        if not actions:
+            return 0, 0
+        if len(actions) == 1:
+            return (1 if await self.async_execute_action(actions[0]) else 0), 1
+        results = await self.async_execute_actions(actions)
+        return sum(1 for result in results if result["success"]), len(results)
+    
+    @staticmethod
+    def _drop_spoken(actions: list, response: str) -> list:
+        """去掉内容与响应相同的播报动作"""
+        response = response.strip()
+        return [
+            action for action in actions
+            if action.get("type") != "speak" or (action.get("message") or "").strip() != response
+        ]
+    
+    @staticmethod
+    def _get_actions(parsed_command: dict) -> list:
+        """从解析结果中取出动作列表（兼容单个 action）"""
+        actions = parsed_command.get("actions")
+        if isinstance(actions, list) and actions:
+            return [action for action in actions if isinstance(action, dict)]
+        action = parsed_command.get("action")
+        return [action] if isinstance(action, dict) else []
+    
     async def _execute_service_action(self, action: dict):
         """执行服务调用"""
         try:
@@ -244,24 +671,58 @@ class DeepSeekBrain:
     
     async def _execute_capture_action(self, action: dict):
         """执行图像捕获和分析"""
-        # 获取主要视觉设备
-        primary_device = self.device_manager.get_primary_device("eyes")
-        if primary_device and primary_device["entities"]:
-            entity_id = primary_device["entities"][0]
-            analysis = await self.vision_processor.analyze_image(entity_id)
-            return {"analysis": analysis}
-        return False
+        # 指定了摄像头、区域或全部摄像头时并发分析多路画面
+        prompt = action.get("prompt") or DEFAULT_VISION_PROMPT
+        camera_ids = [
+            entity_id
+            for entity_id in _as_entity_list((action.get("target") or {}).get("entity_id"))
+            if entity_id.startswith("camera.")
+        ]
+        if not camera_ids and (action.get("area") or action.get("all_cameras")):
+            camera_ids = self.device_manager.get_camera_entities(action.get("area"))
+        if len(camera_ids) > 1:
+            analyses = await self.vision_processor.analyze_cameras(camera_ids, prompt)
+            return {"analyses": analyses}
+        if not camera_ids:
+            # 获取主要视觉设备
+            primary_device = self.device_manager.get_primary_device(ROLE_EYES)
+            if not primary_device or not primary_device["entities"]:
+                return False
+            camera_ids = [
+                next(
+                    (e for e in primary_device["entities"] if e.startswith("camera.")),
+                    primary_device["entities"][0]
+                )
+            ]
+        
+        # 缓存命中时附带结果时长（秒）
+        analysis, age = await self.vision_processor.analyze_image_with_age(camera_ids[0], prompt)
+        return {"analysis": analysis, "age": round(age)}
+    
+    def _is_cacheable(self, command: str, parsed_command: dict, report: dict) -> bool:
+        """只缓存不产生设备副作用、且不依赖有人区域或当前时间的响应"""
+        if parsed_command.get("intent") == "error":
+            return False
+        if report.get("occupancy") or TIME_QUERY_RE.search(command):
+            return False
+        return all(
+            action.get("type") not in ("call_service", "capture_image")
+            for action in self._get_actions(parsed_command)
+        )
     
     def _check_learned_behavior(self, command: str, context: dict):
         """检查是否有学习过的行为"""
-        # 根据命令关键词和小时匹配
+        # 根据归一化命令和小时近似匹配
         hour = context["time"].split(":")[0]
-        key = f"{command}|{hour}"
-        return self.learned_habits.get(key)
+        return self.habit_store.lookup(command, hour)
     
     def _learn_behavior(self, command: str, context: dict, parsed_command: dict):
         """学习用户行为"""
+        # 只学习设备操作，查询类响应交给响应缓存
+        if parsed_command.get("intent") == "error":
+            return
+        actions = self._get_actions(parsed_command)
+        if not actions or any(action.get("type") != "call_service" for action in actions):
+            return
         hour = context["time"].split(":")[0]
-        key = f"{command}|{hour}"
-        self.learned_habits[key] = parsed_command["action"]
-        _LOGGER.info(f"学习到新行为: {key} -> {parsed_command['action']}")
\ No newline at end of file
+        self.habit_store.learn(command, hour, actions if len(actions) > 1 else actions[0])
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""命令调度器 - 并发控制、按实体串行化与背压"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+_LOGGER = logging.getLogger(__name__)
+
+# 全屋锁：实体集合为空或包含该标记的命令独占执行，其他命令全部等待
+ALL_ENTITIES = "*"
+
+
+class SchedulerBusyError(Exception):
+    """等待队列已满，命令被拒绝"""
+
+
+class CommandScheduler:
+    """调度命令执行
+
+    - 同时进行的DeepSeek请求数受信号量限制
+    - 等待中的命令数有上限，超出时立即拒绝（不排队）
+    - 涉及相同实体的命令串行执行，互不相关的命令并行执行
+    - 无法确定实体或涉及全屋的命令独占执行
+    """
+
+    def __init__(self, max_concurrent_api: int = 2, max_pending: int = 8):
+        self.max_pending = max_pending
+        self._api_semaphore = asyncio.Semaphore(max_concurrent_api)
+        self._entity_locks = {}
+        # 全屋读写锁：普通命令共享，全屋命令独占（独占等待期间新的普通命令也排队）
+        self._house_changed = asyncio.Event()
+        self._house_shared = 0
+        self._house_exclusive = False
+        self.pending = 0
+        self.running = 0
+        self.api_in_flight = 0
+        self.rejected = 0
+        self.completed = 0
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+        self._total_wait = 0.0
+
+    @property
+    def queue_depth(self):
+        """等待执行的命令数"""
+        return self.pending - self.running
+
+    @property
+    def average_wait(self):
+        """平均等待时间（秒）"""
+        return self._total_wait / self.completed if self.completed else 0.0
+
+    async def run(self, entity_ids, job):
+        """在实体锁保护下执行 job()，队列满时抛出 SchedulerBusyError"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            _LOGGER.warning(f"命令队列已满({self.pending})，拒绝新命令")
+            raise SchedulerBusyError
+
+        self.pending += 1
+        start = time.monotonic()
+        entity_ids = sorted(set(entity_ids))
+        exclusive = not entity_ids or ALL_ENTITIES in entity_ids
+        try:
+            async with self._lock_house(exclusive), \
+                    self._lock_entities([] if exclusive else entity_ids):
+                wait = time.monotonic() - start
+                self._record_wait(wait)
+                self.running += 1
+                try:
+                    return await job()
+                finally:
+                    self.running -= 1
+        finally:
+            self.pending -= 1
+
+    @asynccontextmanager
+    async def api_slot(self):
+        """获取一个API请求名额"""
+        async with self._api_semaphore:
+            self.api_in_flight += 1
+            try:
+                yield
+            finally:
+                self.api_in_flight -= 1
+
+    def _record_wait(self, wait):
+        """记录等待时间"""
+        self.completed += 1
+        self.last_wait = wait
+        self.max_wait = max(self.max_wait, wait)
+        self._total_wait += wait
+        if wait > 1:
+            _LOGGER.debug(f"命令等待 {wait:.2f}s 后开始执行")
+
+    @asynccontextmanager
+    async def _lock_house(self, exclusive):
+        """获取全屋锁（exclusive=True 时等待所有其他命令结束）"""
+        await self._wait_house(lambda: not self._house_exclusive)
+        if exclusive:
+            self._house_exclusive = True
+            try:
+                await self._wait_house(lambda: self._house_shared == 0)
+            except BaseException:
+                self._house_exclusive = False
+                self._notify_house()
+                raise
+        else:
+            self._house_shared += 1
+        try:
+            yield
+        finally:
+            if exclusive:
+                self._house_exclusive = False
+            else:
+                self._house_shared -= 1
+            self._notify_house()
+
+    async def _wait_house(self, predicate):
+        """等待全屋锁状态满足条件"""
+        while not predicate():
+            await self._house_changed.wait()
+
+    def _notify_house(self):
+        """唤醒所有等待全屋锁的命令"""
+        self._house_changed.set()
+        self._house_changed = asyncio.Event()
+
+    @asynccontextmanager
+    async def _lock_entities(self, entity_ids):
+        """按固定顺序获取实体锁，避免死锁"""
+        acquired = []
+        try:
+            for entity_id in entity_ids:
+                entry = self._entity_locks.get(entity_id)
+                if entry is None:
+                    entry = self._entity_locks[entity_id] = [asyncio.Lock(), 0]
+                entry[1] += 1
+                try:
+                    await entry[0].acquire()
+                except BaseException:
+                    self._release_ref(entity_id)
+                    raise
+                acquired.append(entity_id)
+            yield
+        finally:
+            for entity_id in reversed(acquired):
+                self._entity_locks[entity_id][0].release()
+                self._release_ref(entity_id)
+
+    def _release_ref(self, entity_id):
+        """减少锁引用计数，无人使用时删除"""
+        entry = self._entity_locks[entity_id]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._entity_locks[entity_id]
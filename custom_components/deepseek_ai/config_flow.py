@@ -2,22 +2,41 @@
 from __future__ import annotations
 import logging
 import re
-import aiohttp
 import voluptuous as vol
 
 from homeassistant import config_entries
 from homeassistant.core import callback
 from homeassistant.helpers import config_validation as cv
 
+from .api_client import async_get_client
 from .const import (
     DOMAIN,
     CONF_API_KEY,
     CONF_API_BASE,
     CONF_TEMPERATURE,
     CONF_MAX_TOKENS,
+    CONF_STREAM,
+    CONF_HEDGE_REQUESTS,
+    CONF_VISION_MAX_EDGE,
+    CONF_VISION_QUALITY,
+    CONF_VISION_CHANGE_THRESHOLD,
+    CONF_VISION_CACHE_TTL,
+    CONF_MEMORY_HISTORY,
+    CONF_TTS_BACKEND,
+    CONF_TTS_ENGINE,
     DEFAULT_API_BASE,
     DEFAULT_TEMPERATURE,
-    DEFAULT_MAX_TOKENS
+    DEFAULT_MAX_TOKENS,
+    DEFAULT_STREAM,
+    DEFAULT_HEDGE_REQUESTS,
+    DEFAULT_VISION_MAX_EDGE,
+    DEFAULT_VISION_QUALITY,
+    DEFAULT_VISION_CHANGE_THRESHOLD,
+    DEFAULT_VISION_CACHE_TTL,
+    DEFAULT_MEMORY_HISTORY,
+    DEFAULT_TTS_BACKEND,
+    DEFAULT_TTS_ENGINE,
+    TTS_BACKENDS
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -31,6 +50,23 @@ CONFIG_SCHEMA = vol.Schema({
     vol.Optional(CONF_API_BASE, default=DEFAULT_API_BASE): str,
     vol.Optional(CONF_TEMPERATURE, default=DEFAULT_TEMPERATURE): cv.small_float,
     vol.Optional(CONF_MAX_TOKENS, default=DEFAULT_MAX_TOKENS): cv.positive_int,
+    vol.Optional(CONF_STREAM, default=DEFAULT_STREAM): cv.boolean,
+    vol.Optional(CONF_HEDGE_REQUESTS, default=DEFAULT_HEDGE_REQUESTS): cv.boolean,
+    vol.Optional(CONF_VISION_MAX_EDGE, default=DEFAULT_VISION_MAX_EDGE): vol.All(
+        vol.Coerce(int), vol.Range(min=256, max=4096)
+    ),
+    vol.Optional(CONF_VISION_QUALITY, default=DEFAULT_VISION_QUALITY): vol.All(
+        vol.Coerce(int), vol.Range(min=30, max=95)
+    ),
+    vol.Optional(CONF_VISION_CHANGE_THRESHOLD, default=DEFAULT_VISION_CHANGE_THRESHOLD): vol.All(
+        vol.Coerce(int), vol.Range(min=0, max=64)
+    ),
+    vol.Optional(CONF_VISION_CACHE_TTL, default=DEFAULT_VISION_CACHE_TTL): vol.All(
+        vol.Coerce(int), vol.Range(min=0, max=3600)
+    ),
+    vol.Optional(CONF_MEMORY_HISTORY, default=DEFAULT_MEMORY_HISTORY): cv.boolean,
+    vol.Optional(CONF_TTS_BACKEND, default=DEFAULT_TTS_BACKEND): vol.In(TTS_BACKENDS),
+    vol.Optional(CONF_TTS_ENGINE, default=DEFAULT_TTS_ENGINE): str,
 })
 
 class DeepSeekAIConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -76,13 +112,14 @@ class DeepSeekAIConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     async def _test_api_endpoint(self, api_base: str, api_key: str) -> bool:
         """测试API端点连通性"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{api_base}/models",
-                    headers={"Authorization": f"Bearer {api_key}"},
-                    timeout=10
-                ) as response:
-                    return response.status == 200
+            client = async_get_client(self.hass)
+            async with client.request(
+                "GET",
+                f"{api_base}/models",
+                api_key,
+                timeout=10
+            ) as response:
+                return response.status == 200
         except Exception:
             return False
     
@@ -104,16 +141,55 @@ class DeepSeekAIOptionsFlow(config_entries.OptionsFlow):
             # 更新配置
             return self.async_create_entry(title="", data=user_input)
         
-        # 显示当前配置值
+        # 显示当前配置值（选项覆盖初始配置）
+        current = {**self.config_entry.data, **self.config_entry.options}
         options_schema = vol.Schema({
             vol.Optional(
                 CONF_TEMPERATURE,
-                default=self.config_entry.data.get(CONF_TEMPERATURE, DEFAULT_TEMPERATURE)
+                default=current.get(CONF_TEMPERATURE, DEFAULT_TEMPERATURE)
             ): cv.small_float,
             vol.Optional(
                 CONF_MAX_TOKENS,
-                default=self.config_entry.data.get(CONF_MAX_TOKENS, DEFAULT_MAX_TOKENS)
+                default=current.get(CONF_MAX_TOKENS, DEFAULT_MAX_TOKENS)
             ): cv.positive_int,
+            vol.Optional(
+                CONF_STREAM,
+                default=current.get(CONF_STREAM, DEFAULT_STREAM)
+            ): cv.boolean,
+            vol.Optional(
+                CONF_HEDGE_REQUESTS,
+                default=current.get(CONF_HEDGE_REQUESTS, DEFAULT_HEDGE_REQUESTS)
+            ): cv.boolean,
+            vol.Optional(
+                CONF_VISION_MAX_EDGE,
+                default=current.get(CONF_VISION_MAX_EDGE, DEFAULT_VISION_MAX_EDGE)
+            ): vol.All(vol.Coerce(int), vol.Range(min=256, max=4096)),
+            vol.Optional(
+                CONF_VISION_QUALITY,
+                default=current.get(CONF_VISION_QUALITY, DEFAULT_VISION_QUALITY)
+            ): vol.All(vol.Coerce(int), vol.Range(min=30, max=95)),
+            vol.Optional(
+                CONF_VISION_CHANGE_THRESHOLD,
+                default=current.get(
+                    CONF_VISION_CHANGE_THRESHOLD, DEFAULT_VISION_CHANGE_THRESHOLD
+                )
+            ): vol.All(vol.Coerce(int), vol.Range(min=0, max=64)),
+            vol.Optional(
+                CONF_VISION_CACHE_TTL,
+                default=current.get(CONF_VISION_CACHE_TTL, DEFAULT_VISION_CACHE_TTL)
+            ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+            vol.Optional(
+                CONF_MEMORY_HISTORY,
+                default=current.get(CONF_MEMORY_HISTORY, DEFAULT_MEMORY_HISTORY)
+            ): cv.boolean,
+            vol.Optional(
+                CONF_TTS_BACKEND,
+                default=current.get(CONF_TTS_BACKEND, DEFAULT_TTS_BACKEND)
+            ): vol.In(TTS_BACKENDS),
+            vol.Optional(
+                CONF_TTS_ENGINE,
+                default=current.get(CONF_TTS_ENGINE, DEFAULT_TTS_ENGINE)
+            ): str,
         })
         
         return self.async_show_form(
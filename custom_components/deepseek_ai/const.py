@@ -8,11 +8,29 @@ CONF_TEMPERATURE = "temperature"
 CONF_MAX_TOKENS = "max_tokens"
 CONF_VISION_ENABLED = "vision_enabled"
 CONF_SPEECH_ENABLED = "speech_enabled"
+CONF_STREAM = "stream"
+CONF_HEDGE_REQUESTS = "hedge_requests"
+CONF_VISION_MAX_EDGE = "vision_max_edge"
+CONF_VISION_QUALITY = "vision_quality"
+CONF_VISION_CHANGE_THRESHOLD = "vision_change_threshold"
+CONF_VISION_CACHE_TTL = "vision_cache_ttl"
+CONF_MEMORY_HISTORY = "memory_history"
+CONF_TTS_BACKEND = "tts_backend"
+CONF_TTS_ENGINE = "tts_engine"
 
 # 默认值
 DEFAULT_API_BASE = "https://api.deepseek.com/v1"
 DEFAULT_TEMPERATURE = 0.7
 DEFAULT_MAX_TOKENS = 512
+DEFAULT_STREAM = True
+DEFAULT_HEDGE_REQUESTS = False
+DEFAULT_VISION_MAX_EDGE = 768
+DEFAULT_VISION_QUALITY = 75
+DEFAULT_VISION_CHANGE_THRESHOLD = 4
+DEFAULT_VISION_CACHE_TTL = 60
+DEFAULT_MEMORY_HISTORY = False
+DEFAULT_TTS_BACKEND = "xiaomi"
+DEFAULT_TTS_ENGINE = ""
 
 # 设备角色
 ROLE_EYES = "eyes"
@@ -21,18 +39,88 @@ ROLE_MOUTH = "mouth"
 ROLE_HANDS = "hands"
 ROLE_SENSORS = "sensors"
 
-# 设备类型映射
-DEVICE_ROLE_MAPPING = {
-    "camera": ROLE_EYES,
-    "binary_sensor.motion": ROLE_EYES,
-    "binary_sensor.sound": ROLE_EARS,
-    "media_player": ROLE_MOUTH,
-    "switch": ROLE_HANDS,
-    "light": ROLE_HANDS,
-    "cover": ROLE_HANDS,
-    "climate": ROLE_HANDS,
-    "sensor": ROLE_SENSORS
+# 人体移动/声音传感器的设备类别
+MOTION_DEVICE_CLASSES = ("motion", "occupancy", "presence")
+SOUND_DEVICE_CLASSES = ("sound",)
+
+# 设备分类规则表（启动时编译为按领域/设备类别分发的查找结构）
+# 每条规则可组合以下条件，全部满足才算命中：
+#   domain: 实体领域；device_class: 实体设备类别（元组）；entity_pattern: 实体ID正则
+#   supported_features: 实体必须具备的特性位；manufacturer/model: 设备制造商/型号正则（不区分大小写）
+# 设备可命中多个规则并同时拥有多个角色，priority 最高的角色为主角色
+DEVICE_CLASSIFICATION_RULES = [
+    {"role": ROLE_EYES, "priority": 100, "domain": "camera"},
+    {"role": ROLE_EYES, "priority": 70, "domain": "binary_sensor",
+     "device_class": MOTION_DEVICE_CLASSES},
+    {"role": ROLE_EYES, "priority": 60, "domain": "binary_sensor", "entity_pattern": r"motion"},
+    {"role": ROLE_EYES, "priority": 90, "manufacturer": r"xiaomi|mijia", "model": r"camera"},
+    {"role": ROLE_EARS, "priority": 70, "domain": "binary_sensor", "device_class": SOUND_DEVICE_CLASSES},
+    {"role": ROLE_EARS, "priority": 60, "domain": "binary_sensor", "entity_pattern": r"sound"},
+    # media_player 支持 PLAY_MEDIA (512) 时可用于播报
+    {"role": ROLE_MOUTH, "priority": 95, "domain": "media_player", "supported_features": 512},
+    {"role": ROLE_MOUTH, "priority": 85, "domain": "media_player"},
+    {"role": ROLE_MOUTH, "priority": 90, "manufacturer": r"xiaomi|mijia", "model": r"speaker"},
+    {"role": ROLE_HANDS, "priority": 50, "domain": "light"},
+    {"role": ROLE_HANDS, "priority": 50, "domain": "cover"},
+    {"role": ROLE_HANDS, "priority": 50, "domain": "climate"},
+    {"role": ROLE_HANDS, "priority": 50, "domain": "fan"},
+    {"role": ROLE_HANDS, "priority": 50, "domain": "lock"},
+    {"role": ROLE_HANDS, "priority": 50, "domain": "vacuum"},
+    {"role": ROLE_HANDS, "priority": 40, "domain": "switch"},
+    {"role": ROLE_SENSORS, "priority": 20, "domain": "sensor"},
+    {"role": ROLE_SENSORS, "priority": 10, "domain": "binary_sensor"},
+]
+
+# 领域关键词（用于提示相关性过滤）
+DOMAIN_KEYWORDS = {
+    "light": ["灯", "照明", "亮度"],
+    "cover": ["窗帘", "卷帘", "百叶"],
+    "climate": ["空调", "暖气", "地暖", "制冷", "制热", "温度"],
+    "fan": ["风扇", "新风"],
+    "switch": ["开关", "插座"],
+    "media_player": ["音箱", "电视", "音乐", "播放", "音量"],
+    "camera": ["摄像头", "监控", "看看"],
+    "sensor": ["温度", "湿度", "空气", "PM2.5", "电量", "多少"],
+    "binary_sensor": ["门", "窗", "有人", "人体", "漏水"],
+    "lock": ["门锁", "锁"],
+    "vacuum": ["扫地", "拖地"]
+}
+
+# 语音合成后端
+TTS_BACKEND_XIAOMI = "xiaomi"
+TTS_BACKEND_TTS_SPEAK = "tts_speak"
+TTS_BACKEND_MEDIA_PLAYER = "media_player"
+TTS_BACKENDS = [TTS_BACKEND_XIAOMI, TTS_BACKEND_TTS_SPEAK, TTS_BACKEND_MEDIA_PLAYER]
+
+# 固定话术（启动时预合成）
+CONCERN_PHRASES = {
+    "long_time_no_detection": [
+        "主人，您已经很久没和我说话了，一切都好吗？",
+        "我有点担心，您最近都没回家，需要帮忙吗？",
+        "星黎想你了，您在哪里？"
+    ],
+    "unusual_activity": [
+        "检测到异常情况！您安全吗？",
+        "星黎很担心，请回应我一声",
+        "需要我帮忙联系谁吗？"
+    ]
 }
+DEFAULT_CONCERN_PHRASE = "我有点担心您"
+JOY_PHRASES = [
+    "您回来啦！星黎好开心！",
+    "终于等到您了！",
+    "欢迎回家，我一直都在等您呢"
+]
+CANNED_PHRASES = [
+    *(phrase for phrases in CONCERN_PHRASES.values() for phrase in phrases),
+    DEFAULT_CONCERN_PHRASE,
+    *JOY_PHRASES
+]
+
+# 语音播报优先级
+TTS_PRIORITY_URGENT = "urgent"
+TTS_PRIORITY_NORMAL = "normal"
+TTS_PRIORITY_LOW = "low"
 
 # 情感状态
 EMOTION_CALM = "calm"
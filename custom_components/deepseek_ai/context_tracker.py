@@ -0,0 +1,225 @@
+"""环境上下文追踪器 - 事件驱动维护实时设备状态快照"""
+import logging
+from collections import deque
+
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import HomeAssistant, callback
+
+from .const import ROLE_SENSORS
+
+_LOGGER = logging.getLogger(__name__)
+
+# 计入“开启/活动”数的状态
+ACTIVE_STATES = {
+    "on", "open", "opening", "playing", "unlocked", "cleaning",
+    "heat", "cool", "heat_cool", "auto", "dry", "fan_only"
+}
+
+
+class ContextTracker:
+    """维护实时环境上下文，并通过单一 state_changed 订阅原地更新
+
+    除按角色组织的全屋视图外，还按区域分片（同一设备条目对象），
+    并增量维护每个区域的设备数/实体数/活动实体数概况。
+    设备增量变化时只替换变化设备的条目。
+    """
+
+    def __init__(self, hass: HomeAssistant, device_manager, max_changes: int = 200):
+        self.hass = hass
+        self.device_manager = device_manager
+        self.version = 0
+        self.devices = {}
+        self.sensors = {}
+        # 区域分片: 区域名(无区域为None) -> {角色: [设备条目]}
+        self.areas = {}
+        # 区域概况: 区域名 -> {"devices", "entities", "active"}
+        self.summary = {}
+        self.entity_count = 0
+        self._entity_areas = {}
+        # 设备条目: device_id -> (角色, 条目)
+        self._device_entries = {}
+        self.changes = deque(maxlen=max_changes)
+        self._entity_refs = {}
+        self._change_listeners = []
+        self._unsub_state = None
+        self._unsub_devices = None
+
+    async def async_setup(self):
+        """构建初始快照并订阅状态变化"""
+        self.rebuild()
+        self._unsub_state = self.hass.bus.async_listen(
+            EVENT_STATE_CHANGED, self._handle_state_changed
+        )
+        self._unsub_devices = self.device_manager.async_add_listener(self.rebuild)
+
+    async def async_cleanup(self):
+        """取消订阅"""
+        if self._unsub_state:
+            self._unsub_state()
+            self._unsub_state = None
+        if self._unsub_devices:
+            self._unsub_devices()
+            self._unsub_devices = None
+
+    @callback
+    def async_add_change_listener(self, change_callback):
+        """注册实体变化回调 change_callback(entity_id, new_value)，返回取消函数"""
+        self._change_listeners.append(change_callback)
+
+        @callback
+        def remove_listener():
+            if change_callback in self._change_listeners:
+                self._change_listeners.remove(change_callback)
+
+        return remove_listener
+
+    @callback
+    def rebuild(self, changes=None):
+        """设备变化后更新快照：changes 为 None 时全量重建，否则只替换变化的设备"""
+        if changes is not None:
+            self._apply_device_changes(changes)
+            return
+
+        self.devices = {role: [] for role in self.device_manager.device_roles}
+        self.sensors = {}
+        self._entity_refs = {}
+        self.areas = {}
+        self.summary = {}
+        self._entity_areas = {}
+        self._device_entries = {}
+        for device in self.device_manager.devices.values():
+            self._add_device(device)
+        self.entity_count = len(self._entity_refs)
+        self.version += 1
+        self.changes.clear()
+        _LOGGER.debug(f"环境上下文已重建: {self.entity_count} 个实体, 版本 {self.version}")
+
+    @callback
+    def _apply_device_changes(self, changes):
+        """替换变化设备的条目，并将涉及的实体作为状态变化通知监听者"""
+        for device_id in changes["devices"]:
+            self._remove_device(device_id)
+        for device_id in changes["devices"]:
+            device = self.device_manager.get_device(device_id)
+            if device:
+                self._add_device(device)
+        self.entity_count = len(self._entity_refs)
+
+        for entity_id in changes["entities"]:
+            refs = self._entity_refs.get(entity_id)
+            self._record_change(entity_id, refs[0].get(entity_id) if refs else None)
+        _LOGGER.debug(
+            f"环境上下文增量更新: {len(changes['devices'])} 个设备, 版本 {self.version}"
+        )
+
+    def _add_device(self, device):
+        """加入设备条目（多角色设备只在主角色下出现一次）"""
+        role = device["role"]
+        area = device.get("area")
+        area_summary = self.summary.setdefault(area, {"devices": 0, "entities": 0, "active": 0})
+        area_summary["devices"] += 1
+        device_state = {}
+        for entity_id in device["entities"]:
+            value = device_state[entity_id] = self._read_state(entity_id)
+            self._entity_refs[entity_id] = [device_state]
+            self._entity_areas[entity_id] = area
+            area_summary["entities"] += 1
+            area_summary["active"] += value in ACTIVE_STATES
+        entry = {
+            "id": device["id"],
+            "name": device["name"],
+            "area": area,
+            "state": device_state
+        }
+        self.devices.setdefault(role, []).append(entry)
+        self.areas.setdefault(area, {}).setdefault(role, []).append(entry)
+        self._device_entries[device["id"]] = (role, entry)
+
+        if role == ROLE_SENSORS:
+            for entity_id, state in device_state.items():
+                if state is not None:
+                    self.sensors[entity_id] = state
+                self._entity_refs[entity_id].append(self.sensors)
+
+    def _remove_device(self, device_id):
+        """移除设备条目及其实体的引用和概况计数"""
+        role, entry = self._device_entries.pop(device_id, (None, None))
+        if entry is None:
+            return
+        area = entry["area"]
+        role_entries = self.devices.get(role, [])
+        role_entries[:] = [other for other in role_entries if other is not entry]
+        shard = self.areas.get(area, {})
+        shard_entries = [other for other in shard.get(role, []) if other is not entry]
+        if shard_entries:
+            shard[role] = shard_entries
+        else:
+            shard.pop(role, None)
+            if not shard:
+                self.areas.pop(area, None)
+
+        area_summary = self.summary[area]
+        area_summary["devices"] -= 1
+        for entity_id, value in entry["state"].items():
+            area_summary["entities"] -= 1
+            area_summary["active"] -= value in ACTIVE_STATES
+            self._entity_refs.pop(entity_id, None)
+            self._entity_areas.pop(entity_id, None)
+            self.sensors.pop(entity_id, None)
+        if not area_summary["devices"]:
+            del self.summary[area]
+
+    def snapshot(self):
+        """返回当前快照（实时视图，不做复制）"""
+        return {
+            "version": self.version,
+            "devices": self.devices,
+            "sensors": self.sensors,
+            "areas": self.areas,
+            "summary": self.summary,
+            "entity_count": self.entity_count
+        }
+
+    def changes_since(self, version: int):
+        """获取指定版本之后的状态变化 [(版本, 实体ID, 新状态)]"""
+        result = []
+        for change in reversed(self.changes):
+            if change[0] <= version:
+                break
+            result.append(change)
+        result.reverse()
+        return result
+
+    def _read_state(self, entity_id):
+        """读取实体当前状态值"""
+        state = self.hass.states.get(entity_id)
+        return state.state if state else None
+
+    @callback
+    def _handle_state_changed(self, event):
+        """原地更新受影响的快照条目"""
+        entity_id = event.data.get("entity_id")
+        refs = self._entity_refs.get(entity_id)
+        if refs is None:
+            return
+
+        new_state = event.data.get("new_state")
+        value = new_state.state if new_state else None
+        old_value = refs[0].get(entity_id)
+        active_delta = (value in ACTIVE_STATES) - (old_value in ACTIVE_STATES)
+        if active_delta:
+            self.summary[self._entity_areas.get(entity_id)]["active"] += active_delta
+        for target in refs:
+            if target is self.sensors and value is None:
+                target.pop(entity_id, None)
+            else:
+                target[entity_id] = value
+        self._record_change(entity_id, value)
+
+    @callback
+    def _record_change(self, entity_id, value):
+        """记录变化并通知监听者"""
+        self.version += 1
+        self.changes.append((self.version, entity_id, value))
+        for change_callback in self._change_listeners:
+            change_callback(entity_id, value)
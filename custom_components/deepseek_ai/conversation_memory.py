@@ -0,0 +1,205 @@
+"""对话记忆 - 按会话保存有界的多轮对话，旧消息滚动为摘要并持久化"""
+import json
+import logging
+import time
+from collections import OrderedDict, deque
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .prompt_builder import estimate_tokens
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.conversations"
+SAVE_DELAY = 30
+
+# 摘要本身的长度上限（字符），摘要失败时的兜底截断也使用该值
+MAX_SUMMARY_CHARS = 400
+
+
+class ConversationMemory:
+    """按 conversation_id 保存对话
+
+    - 每个会话是一个消息环形缓冲区，超出 token 预算的最旧消息移入待摘要队列
+    - 待摘要消息由 summarize(旧摘要, 消息列表) 合并进会话摘要
+    - 会话数量按LRU限制，持久化数据超过字节上限时淘汰最久未用的会话
+    """
+
+    def __init__(self, hass: HomeAssistant, summarize, max_conversations: int = 50,
+                 max_messages: int = 20, token_budget: int = 600,
+                 max_bytes: int = 256 * 1024, ttl: int = 7 * 24 * 3600):
+        self.hass = hass
+        self._summarize = summarize
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.token_budget = token_budget
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.conversations = OrderedDict()
+        self.summaries = 0
+        self.evictions = 0
+        self._summarizing = set()
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+
+    async def async_load(self):
+        """从存储加载会话"""
+        data = await self._store.async_load() or {}
+        now = time.time()
+        for conversation_id, stored in sorted(
+            data.get("conversations", {}).items(), key=lambda item: item[1]["updated"]
+        ):
+            if now - stored["updated"] > self.ttl:
+                continue
+            conversation = self._new_conversation()
+            conversation["summary"] = stored.get("summary", "")
+            conversation["updated"] = stored["updated"]
+            for message in stored.get("messages", []):
+                self._append(conversation, message["role"], message["content"])
+            # 上次未完成摘要的消息，在该会话下一轮对话时继续摘要
+            conversation["pending"] = [
+                (message["role"], message["content"]) for message in stored.get("pending", [])
+            ]
+            self.conversations[conversation_id] = conversation
+        self._evict()
+        _LOGGER.info(f"已加载 {len(self.conversations)} 个对话记忆")
+
+    async def async_save(self):
+        """立即保存"""
+        await self._store.async_save(self._data_to_save())
+
+    def history(self, conversation_id):
+        """获取发送给模型的历史消息（摘要 + 近期消息）"""
+        conversation = self.conversations.get(conversation_id) if conversation_id else None
+        if conversation is None:
+            return []
+        messages = []
+        if conversation["summary"]:
+            messages.append({
+                "role": "system",
+                "content": f"此前对话摘要: {conversation['summary']}"
+            })
+        messages.extend(
+            {"role": role, "content": content}
+            for role, content, _ in conversation["messages"]
+        )
+        return messages
+
+    @callback
+    def add_turn(self, conversation_id, user_text: str, assistant_text: str):
+        """记录一轮对话，超出预算时安排摘要"""
+        if not conversation_id:
+            return
+        conversation = self.conversations.get(conversation_id)
+        if conversation is None:
+            conversation = self.conversations[conversation_id] = self._new_conversation()
+        else:
+            self.conversations.move_to_end(conversation_id)
+        conversation["updated"] = time.time()
+
+        self._append(conversation, "user", user_text)
+        self._append(conversation, "assistant", assistant_text)
+
+        # 超出条数或token预算的最旧消息移入待摘要队列
+        messages = conversation["messages"]
+        while messages and (
+            len(messages) > self.max_messages or conversation["tokens"] > self.token_budget
+        ):
+            role, content, tokens = messages.popleft()
+            conversation["tokens"] -= tokens
+            conversation["pending"].append((role, content))
+
+        if conversation["pending"] and conversation_id not in self._summarizing:
+            self._summarizing.add(conversation_id)
+            self.hass.async_create_task(self._async_summarize(conversation_id))
+
+        self._evict()
+        self._schedule_save()
+
+    def _new_conversation(self):
+        """新建会话结构"""
+        return {
+            "messages": deque(),
+            "tokens": 0,
+            "summary": "",
+            "pending": [],
+            "updated": time.time()
+        }
+
+    @staticmethod
+    def _append(conversation, role: str, content: str):
+        """追加消息并累计token"""
+        tokens = estimate_tokens(content)
+        conversation["messages"].append((role, content, tokens))
+        conversation["tokens"] += tokens
+
+    async def _async_summarize(self, conversation_id):
+        """将待摘要消息合并进会话摘要"""
+        try:
+            while True:
+                conversation = self.conversations.get(conversation_id)
+                if conversation is None or not conversation["pending"]:
+                    return
+                # 摘要完成前消息留在待摘要队列中，期间保存也不会丢失
+                pending = list(conversation["pending"])
+                try:
+                    summary = await self._summarize(conversation["summary"], pending)
+                except Exception as e:
+                    _LOGGER.debug(f"对话摘要失败，使用截断兜底: {e!r}")
+                    summary = None
+                if not summary:
+                    summary = conversation["summary"] + "".join(
+                        f" {'用户' if role == 'user' else '助手'}: {content}"
+                        for role, content in pending
+                    )
+                conversation["summary"] = summary.strip()[-MAX_SUMMARY_CHARS:]
+                del conversation["pending"][:len(pending)]
+                self.summaries += 1
+                self._schedule_save()
+        finally:
+            self._summarizing.discard(conversation_id)
+
+    def _evict(self):
+        """超过会话数量上限时淘汰最久未用的会话"""
+        while len(self.conversations) > self.max_conversations:
+            self.conversations.popitem(last=False)
+            self.evictions += 1
+
+    @callback
+    def _schedule_save(self):
+        """延迟合并写入"""
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self):
+        """生成持久化数据，超过字节上限时淘汰最久未用的会话"""
+        stored = {
+            conversation_id: {
+                "summary": conversation["summary"],
+                "updated": conversation["updated"],
+                "messages": [
+                    {"role": role, "content": content}
+                    for role, content, _ in conversation["messages"]
+                ],
+                "pending": [
+                    {"role": role, "content": content}
+                    for role, content in conversation["pending"]
+                ]
+            }
+            for conversation_id, conversation in self.conversations.items()
+        }
+        sizes = {
+            conversation_id: len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+            for conversation_id, value in stored.items()
+        }
+        total = sum(sizes.values())
+        for conversation_id in list(stored):
+            if total <= self.max_bytes:
+                break
+            total -= sizes[conversation_id]
+            del stored[conversation_id]
+            self.conversations.pop(conversation_id, None)
+            self.evictions += 1
+        return {"conversations": stored}
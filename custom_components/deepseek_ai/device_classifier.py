@@ -1,34 +1,94 @@
 """智能设备分类器"""
 import logging
-from .const import DEVICE_ROLE_MAPPING, ROLE_SENSORS
+import re
+from .const import DEVICE_CLASSIFICATION_RULES, ROLE_SENSORS
 
 _LOGGER = logging.getLogger(__name__)
 
+
+class _CompiledRule:
+    """编译后的单条规则"""
+
+    __slots__ = ("role", "priority", "entity_pattern", "supported_features", "manufacturer", "model")
+
+    def __init__(self, rule):
+        self.role = rule["role"]
+        self.priority = rule.get("priority", 0)
+        self.entity_pattern = _compile(rule.get("entity_pattern"))
+        self.supported_features = rule.get("supported_features", 0)
+        self.manufacturer = _compile(rule.get("manufacturer"))
+        self.model = _compile(rule.get("model"))
+
+    def matches_entity(self, entity):
+        """实体级条件（领域与设备类别已由分发结构保证）"""
+        if self.entity_pattern and not self.entity_pattern.search(entity.entity_id):
+            return False
+        if self.supported_features:
+            features = getattr(entity, "supported_features", 0) or 0
+            if features & self.supported_features != self.supported_features:
+                return False
+        return True
+
+    def matches_device(self, device_entry):
+        """设备级条件（制造商、型号）"""
+        if self.manufacturer and not self.manufacturer.search(device_entry.manufacturer or ""):
+            return False
+        if self.model and not self.model.search(device_entry.model or ""):
+            return False
+        return True
+
+
+def _compile(pattern):
+    """编译不区分大小写的正则"""
+    return re.compile(pattern, re.IGNORECASE) if pattern else None
+
+
 class DeviceClassifier:
-    """根据设备特性分配角色"""
-    
+    """根据设备特性分配角色
+
+    规则表在构造时编译为:
+    - (领域, 设备类别) -> 规则列表
+    - 领域 -> 规则列表（不限设备类别）
+    - 仅含制造商/型号条件的设备级规则列表
+    分类时每个实体只做两次字典查找，设备可同时拥有多个角色。
+    """
+
+    def __init__(self, rules=None):
+        self._by_domain_class = {}
+        self._by_domain = {}
+        self._device_rules = []
+        for rule in rules if rules is not None else DEVICE_CLASSIFICATION_RULES:
+            compiled = _CompiledRule(rule)
+            domain = rule.get("domain")
+            if domain is None:
+                self._device_rules.append(compiled)
+            elif rule.get("device_class"):
+                for device_class in rule["device_class"]:
+                    self._by_domain_class.setdefault((domain, device_class), []).append(compiled)
+            else:
+                self._by_domain.setdefault(domain, []).append(compiled)
+
     def classify_device(self, device_entry, entities):
-        """分类设备角色"""
-        # 1. 根据设备类型分类
+        """分类设备角色，返回按优先级排序的角色列表（第一个为主角色）"""
+        scores = {}
         for entity in entities:
-            entity_type = entity.domain
-            if entity_type in DEVICE_ROLE_MAPPING:
-                return DEVICE_ROLE_MAPPING[entity_type]
-            
-            if entity_type == "binary_sensor":
-                if "motion" in entity.entity_id:
-                    return "eyes"
-                elif "sound" in entity.entity_id:
-                    return "ears"
-        
-        # 2. 根据制造商信息分类
-        if device_entry.manufacturer:
-            manufacturer = device_entry.manufacturer.lower()
-            if "xiaomi" in manufacturer or "mijia" in manufacturer:
-                if "camera" in (device_entry.model or "").lower():
-                    return "eyes"
-                if "speaker" in (device_entry.model or "").lower():
-                    return "mouth"
-        
-        # 3. 默认分类为传感器
-        return ROLE_SENSORS
\ No newline at end of file
+            if getattr(entity, "disabled_by", None):
+                continue
+            domain = entity.domain
+            device_class = entity.device_class or entity.original_device_class
+            candidates = self._by_domain.get(domain, ())
+            if device_class:
+                candidates = [*self._by_domain_class.get((domain, device_class), ()), *candidates]
+            for rule in candidates:
+                if rule.priority > scores.get(rule.role, -1) and rule.matches_entity(entity) \
+                        and rule.matches_device(device_entry):
+                    scores[rule.role] = rule.priority
+
+        for rule in self._device_rules:
+            if rule.priority > scores.get(rule.role, -1) and rule.matches_device(device_entry):
+                scores[rule.role] = rule.priority
+
+        # 默认分类为传感器
+        if not scores:
+            return [ROLE_SENSORS]
+        return sorted(scores, key=scores.get, reverse=True)
@@ -1,71 +1,404 @@
 """设备管理器 - 发现、分类和管理设备"""
 import logging
-from homeassistant.helpers import device_registry as dr, entity_registry as er
-from .const import ROLE_EYES, ROLE_EARS, ROLE_MOUTH, ROLE_HANDS, ROLE_SENSORS
+from homeassistant.core import callback
+from homeassistant.helpers import (
+    area_registry as ar,
+    device_registry as dr,
+    entity_registry as er
+)
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+from .const import DOMAIN, ROLE_EYES, ROLE_EARS, ROLE_MOUTH, ROLE_HANDS, ROLE_SENSORS
 from .device_classifier import DeviceClassifier
+from .name_index import NameTrie
 
 _LOGGER = logging.getLogger(__name__)
 
+ROLES = (ROLE_EYES, ROLE_EARS, ROLE_MOUTH, ROLE_HANDS, ROLE_SENSORS)
+
+# 注册表事件合并窗口（秒），集成批量创建实体时只重新分类一次
+REGISTRY_DEBOUNCE = 1.0
+
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.primary_devices"
+SAVE_DELAY = 10
+
 class DeviceManager:
-    """管理所有智能家居设备及其角色"""
+    """管理所有智能家居设备及其角色
+    
+    启动时全量扫描一次，之后订阅设备/实体/区域注册表更新事件，
+    只重新分类受影响的设备，并只更新这些设备在各索引中的条目。
+    监听者收到变化范围，同样可以只处理受影响的条目。
+    """
     
     def __init__(self, hass):
         self.hass = hass
         self.classifier = DeviceClassifier()
-        self.device_roles = {
-            ROLE_EYES: [],
-            ROLE_EARS: [],
-            ROLE_MOUTH: [],
-            ROLE_HANDS: [],
-            ROLE_SENSORS: []
+        self.device_roles = {role: [] for role in ROLES}
+        # 设备信息: device_id -> device_info
+        self.devices = {}
+        # 实体索引: entity_id -> {名称、别名、区域、领域、所属设备}
+        self.entity_index = {}
+        # 实体所属设备（包含已禁用实体）: entity_id -> device_id
+        self._entity_devices = {}
+        # 区域索引: 区域名 -> [device_info]，区域名 -> area_id
+        self.areas = {}
+        self._area_ids = {}
+        # 名称/别名前缀树: 名称 -> entity_id；区域名前缀树: 区域名 -> 区域名
+        self.name_trie = NameTrie()
+        self.area_trie = NameTrie()
+        # 首选设备: {"roles": {角色: device_id}, "areas": {area_id: {角色: device_id}}}
+        self.primary_preferences = {"roles": {}, "areas": {}}
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._listeners = []
+        self._unsub_registry = []
+        self._pending_devices = set()
+        self._cancel_pending = None
+        self.full_scans = 0
+        self.incremental_updates = 0
+    
+    async def async_setup(self):
+        """加载首选设备设置并订阅注册表更新事件"""
+        data = await self._store.async_load() or {}
+        self.primary_preferences = {
+            "roles": dict(data.get("roles", {})),
+            "areas": {area_id: dict(roles) for area_id, roles in data.get("areas", {}).items()}
         }
+        self._unsub_registry = [
+            self.hass.bus.async_listen(
+                dr.EVENT_DEVICE_REGISTRY_UPDATED, self._handle_device_registry_updated
+            ),
+            self.hass.bus.async_listen(
+                er.EVENT_ENTITY_REGISTRY_UPDATED, self._handle_entity_registry_updated
+            ),
+            self.hass.bus.async_listen(
+                ar.EVENT_AREA_REGISTRY_UPDATED, self._handle_area_registry_updated
+            )
+        ]
+    
+    @callback
+    def async_cleanup(self):
+        """取消订阅和待处理的更新"""
+        for unsub in self._unsub_registry:
+            unsub()
+        self._unsub_registry = []
+        if self._cancel_pending:
+            self._cancel_pending()
+            self._cancel_pending = None
+        self._pending_devices.clear()
+    
+    @callback
+    def async_add_listener(self, update_callback):
+        """注册设备变化回调，返回取消函数
+
+        回调参数 changes 为 None 表示全量重新发现；增量更新时为
+        {"devices": 变化的设备ID集合, "entities": 这些设备变化前后涉及的实体ID集合}
+        """
+        self._listeners.append(update_callback)
+        
+        @callback
+        def remove_listener():
+            if update_callback in self._listeners:
+                self._listeners.remove(update_callback)
+        
+        return remove_listener
     
     async def discover_devices(self):
-        """发现并分类所有设备"""
+        """全量发现并分类所有设备（启动时或按需调用）"""
         _LOGGER.info("开始设备发现...")
         
-        # 重置设备列表
-        for role in self.device_roles:
-            self.device_roles[role] = []
-        
         # 获取设备注册表
         device_registry = dr.async_get(self.hass)
         entity_registry = er.async_get(self.hass)
+        area_registry = ar.async_get(self.hass)
         
+        built = []
         # 遍历所有设备
         for device_entry in device_registry.devices.values():
-            device_entities = er.async_entries_for_device(
-                entity_registry, device_entry.id
+            device_info, device_index = self._build_device(
+                device_entry, entity_registry, area_registry
             )
-            
-            # 分类设备
-            role = self.classifier.classify_device(device_entry, device_entities)
-            if role:
-                device_info = {
-                    "id": device_entry.id,
-                    "name": device_entry.name or device_entry.id,
-                    "manufacturer": device_entry.manufacturer or "Unknown",
-                    "model": device_entry.model or "Unknown",
-                    "entities": [e.entity_id for e in device_entities],
-                    "role": role
-                }
-                
-                self.device_roles[role].append(device_info)
-                _LOGGER.debug(f"设备分类: {device_info['name']} -> {role}")
+            if device_info:
+                built.append((device_info, device_index))
         
-        _LOGGER.info(f"设备发现完成: {sum(len(v) for v in self.device_roles.values())} 个设备")
+        # 有全量结果后，之前排队的增量更新已无意义
+        self._pending_devices.clear()
+        self._reset_indexes()
+        for device_info, device_index in built:
+            self._index_device(device_info, device_index)
+        self.full_scans += 1
+        self._notify(None)
+        _LOGGER.info(f"设备发现完成: {len(self.devices)} 个设备")
+    
+    def _build_device(self, device_entry, entity_registry, area_registry):
+        """分类单个设备，返回 (device_info 或 None, 该设备的实体索引)"""
+        device_entities = er.async_entries_for_device(
+            entity_registry, device_entry.id
+        )
+        
+        # 分类设备（可同时拥有多个角色，第一个为主角色）
+        roles = self.classifier.classify_device(device_entry, device_entities)
+        if not roles:
+            return None, {}
+        
+        area = area_registry.async_get_area(device_entry.area_id) if device_entry.area_id else None
+        device_info = {
+            "id": device_entry.id,
+            "name": device_entry.name or device_entry.id,
+            "manufacturer": device_entry.manufacturer or "Unknown",
+            "model": device_entry.model or "Unknown",
+            "area_id": device_entry.area_id,
+            "area": area.name if area else None,
+            "entities": [e.entity_id for e in device_entities],
+            "role": roles[0],
+            "roles": roles
+        }
+        _LOGGER.debug(f"设备分类: {device_info['name']} -> {roles}")
+        
+        # 建立实体索引（名称、别名、区域）
+        device_index = {}
+        for entity in device_entities:
+            if entity.disabled_by:
+                continue
+            entity_area = area_registry.async_get_area(entity.area_id) if entity.area_id else None
+            device_index[entity.entity_id] = {
+                "name": entity.name or entity.original_name or device_info["name"],
+                "aliases": list(getattr(entity, "aliases", None) or []),
+                "area": entity_area.name if entity_area else device_info["area"],
+                "domain": entity.domain,
+                "device_class": entity.device_class or entity.original_device_class,
+                "device_id": device_entry.id
+            }
+        return device_info, device_index
+    
+    @callback
+    def _reset_indexes(self):
+        """清空所有索引（全量重建前调用）"""
+        self.devices = {}
+        self.entity_index = {}
+        self.device_roles = {role: [] for role in ROLES}
+        self._entity_devices = {}
+        self.areas = {}
+        self._area_ids = {}
+        self.name_trie = NameTrie()
+        self.area_trie = NameTrie()
+    
+    @callback
+    def _index_device(self, device_info, device_index):
+        """将一个设备及其实体加入各索引"""
+        device_id = device_info["id"]
+        self.devices[device_id] = device_info
+        for role in device_info["roles"]:
+            self.device_roles.setdefault(role, []).append(device_info)
+        for entity_id in device_info["entities"]:
+            self._entity_devices[entity_id] = device_id
+        area = device_info["area"]
+        if area:
+            self.areas.setdefault(area, []).append(device_info)
+            self._area_ids[area] = device_info["area_id"]
+            self.area_trie.insert(area, area)
+        for entity_id, info in device_index.items():
+            self.entity_index[entity_id] = info
+            for name in (device_info["name"], info["name"], *info["aliases"]):
+                self.name_trie.insert(name, entity_id)
+    
+    @callback
+    def _unindex_device(self, device_id):
+        """从各索引中移除一个设备，返回其原有的实体ID"""
+        device_info = self.devices.pop(device_id, None)
+        if device_info is None:
+            return set()
+        for role in device_info["roles"]:
+            role_devices = self.device_roles.get(role, [])
+            role_devices[:] = [device for device in role_devices if device["id"] != device_id]
+        area = device_info["area"]
+        if area:
+            area_devices = [
+                device for device in self.areas.get(area, []) if device["id"] != device_id
+            ]
+            if area_devices:
+                self.areas[area] = area_devices
+            else:
+                self.areas.pop(area, None)
+                self._area_ids.pop(area, None)
+                self.area_trie.remove(area, area)
+        for entity_id in device_info["entities"]:
+            if self._entity_devices.get(entity_id) == device_id:
+                del self._entity_devices[entity_id]
+            info = self.entity_index.get(entity_id)
+            if info and info["device_id"] == device_id:
+                del self.entity_index[entity_id]
+                for name in (device_info["name"], info["name"], *info["aliases"]):
+                    self.name_trie.remove(name, entity_id)
+        return set(device_info["entities"])
+    
+    @callback
+    def _notify(self, changes):
+        """通知监听者"""
+        for update_callback in list(self._listeners):
+            update_callback(changes)
+    
+    @callback
+    def _schedule_update(self, device_ids):
+        """记录需要重新分类的设备，合并窗口结束后统一处理"""
+        self._pending_devices.update(device_id for device_id in device_ids if device_id)
+        if self._pending_devices and self._cancel_pending is None:
+            self._cancel_pending = async_call_later(
+                self.hass, REGISTRY_DEBOUNCE, self._async_apply_pending
+            )
+    
+    @callback
+    def _handle_device_registry_updated(self, event):
+        """设备新增、修改或删除"""
+        self._schedule_update([event.data.get("device_id")])
+    
+    @callback
+    def _handle_entity_registry_updated(self, event):
+        """实体新增、修改或删除时，重新分类其新旧所属设备"""
+        data = event.data
+        entity_id = data.get("entity_id")
+        device_ids = [
+            self._entity_devices.get(entity_id),
+            self._entity_devices.get(data.get("old_entity_id"))
+        ]
+        changes = data.get("changes") or {}
+        if "device_id" in changes:
+            device_ids.append(changes["device_id"])
+        if data.get("action") != "remove":
+            entity_entry = er.async_get(self.hass).async_get(entity_id)
+            if entity_entry is not None:
+                device_ids.append(entity_entry.device_id)
+        self._schedule_update(device_ids)
+    
+    @callback
+    def _handle_area_registry_updated(self, event):
+        """区域修改时，重新分类该区域内的设备"""
+        area_id = event.data.get("area_id")
+        self._schedule_update(
+            device_id for device_id, device_info in self.devices.items()
+            if device_info["area_id"] == area_id
+        )
+    
+    @callback
+    def _async_apply_pending(self, _now=None):
+        """对排队的设备执行增量重新分类"""
+        self._cancel_pending = None
+        device_ids, self._pending_devices = self._pending_devices, set()
+        if not device_ids:
+            return
+        
+        device_registry = dr.async_get(self.hass)
+        entity_registry = er.async_get(self.hass)
+        area_registry = ar.async_get(self.hass)
+        
+        # 先移除全部旧条目再加入新条目，实体在设备间移动时不会误删新条目
+        entity_ids = set()
+        for device_id in device_ids:
+            entity_ids |= self._unindex_device(device_id)
+        for device_id in device_ids:
+            device_entry = device_registry.async_get(device_id)
+            if device_entry is None:
+                continue
+            device_info, device_index = self._build_device(
+                device_entry, entity_registry, area_registry
+            )
+            if device_info:
+                self._index_device(device_info, device_index)
+                entity_ids.update(device_info["entities"])
+        
+        self.incremental_updates += 1
+        self._notify({"devices": device_ids, "entities": entity_ids})
+        _LOGGER.debug(f"增量更新 {len(device_ids)} 个设备，当前共 {len(self.devices)} 个设备")
     
     def get_devices_by_role(self, role):
         """获取指定角色的设备"""
         return self.device_roles.get(role, [])
     
-    def get_primary_device(self, role):
-        """获取主要设备（例如：主要摄像头）"""
+    def get_device(self, device_id):
+        """按设备ID获取设备"""
+        return self.devices.get(device_id)
+    
+    def get_device_for_entity(self, entity_id):
+        """获取实体所属的设备"""
+        return self.devices.get(self._entity_devices.get(entity_id))
+    
+    def get_devices_by_area(self, area, role=None):
+        """获取指定区域（区域名）的设备，可按角色过滤"""
+        devices = self.areas.get(area, [])
+        if role is None:
+            return devices
+        return [device for device in devices if role in device["roles"]]
+    
+    def find_entities_by_name(self, name, fuzzy=False):
+        """按名称或别名查找实体：先精确，再前缀，fuzzy=True 时允许一个字的差异"""
+        entity_ids = self.name_trie.lookup(name) or self.name_trie.find_prefix(name)
+        if not entity_ids and fuzzy:
+            entity_ids = self.name_trie.find_fuzzy(name)
+        return entity_ids
+    
+    def match_names(self, text):
+        """找出文本中提到的设备/实体名称，返回 {名称: {entity_id}}"""
+        return {name: entity_ids for _, name, entity_ids in self.name_trie.find_in_text(text)}
+    
+    def match_areas(self, text):
+        """找出文本中提到的区域名"""
+        return {
+            area
+            for _, _, areas in self.area_trie.find_in_text(text)
+            for area in areas
+        }
+    
+    def get_camera_entities(self, area=None):
+        """获取视觉角色中的摄像头实体，可按区域过滤"""
+        devices = self.get_devices_by_role(ROLE_EYES) if area is None else self.get_devices_by_area(area, ROLE_EYES)
+        return [
+            entity_id
+            for device in devices
+            for entity_id in device["entities"]
+            if entity_id.startswith("camera.")
+        ]
+    
+    def get_primary_device(self, role, area=None):
+        """获取主要设备：区域首选 > 角色首选(同区域) > 区域内第一个 > 角色首选 > 角色内第一个"""
+        preferences = self.primary_preferences
+        role_preferred = self._preferred(preferences["roles"].get(role), role)
+        if area is not None:
+            area_preferred = self._preferred(
+                preferences["areas"].get(self._area_ids.get(area), {}).get(role), role
+            )
+            if area_preferred:
+                return area_preferred
+            if role_preferred and role_preferred["area"] == area:
+                return role_preferred
+            area_devices = self.get_devices_by_area(area, role)
+            if area_devices:
+                return area_devices[0]
+        if role_preferred:
+            return role_preferred
         devices = self.get_devices_by_role(role)
-        if devices:
-            # 优先选择名称包含"主"或"客厅"的设备
-            for device in devices:
-                if "主" in device["name"] or "客厅" in device["name"]:
-                    return device
-            return devices[0]
-        return None
\ No newline at end of file
+        return devices[0] if devices else None
+    
+    def _preferred(self, device_id, role):
+        """首选设备仍存在且角色一致时返回"""
+        device = self.devices.get(device_id) if device_id else None
+        if device and role in device["roles"]:
+            return device
+        return None
+    
+    @callback
+    def async_set_primary_device(self, role, device_id, area_id=None):
+        """设置角色（或区域内角色）的首选设备，device_id 为空时清除"""
+        if area_id:
+            target = self.primary_preferences["areas"].setdefault(area_id, {})
+        else:
+            target = self.primary_preferences["roles"]
+        if device_id:
+            target[role] = device_id
+        else:
+            target.pop(role, None)
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+    
+    @callback
+    def _data_to_save(self):
+        """生成持久化数据"""
+        return self.primary_preferences
@@ -2,68 +2,81 @@
 import logging
 import random
 from datetime import datetime
+from .const import (
+    TTS_PRIORITY_URGENT,
+    TTS_PRIORITY_NORMAL,
+    CONCERN_PHRASES,
+    DEFAULT_CONCERN_PHRASE,
+    JOY_PHRASES
+)
+from .memory_store import MemoryStore
 
 _LOGGER = logging.getLogger(__name__)
 
+MEMORY_DB_FILE = "deepseek_ai_memory.db"
+RECALL_LIMIT = 5
+
 class EmotionEngine:
     """AI情感引擎"""
     
-    def __init__(self, hass):
+    def __init__(self, hass, history_db: bool = False):
         self.hass = hass
         self.emotion_state = "calm"  # calm/concerned/worried/happy
         self.last_interaction = datetime.now()
-        self.memory = []
+        # 内存中保留最近的互动，开启后完整历史写入磁盘
+        self.memory = MemoryStore(
+            db_path=hass.config.path(MEMORY_DB_FILE) if history_db else None
+        )
+    
+    async def async_setup(self):
+        """打开磁盘记忆层"""
+        if self.memory.db_path:
+            await self.hass.async_add_executor_job(self.memory.open)
+    
+    async def async_cleanup(self):
+        """写入剩余记忆并关闭磁盘层"""
+        if self.memory.db_path:
+            await self.hass.async_add_executor_job(
+                self.memory.close, self.memory.take_pending()
+            )
+    
+    def _remember(self, event, **fields):
+        """追加记忆，攒够一批后写入磁盘层"""
+        if self.memory.append(event, **fields):
+            self.hass.async_create_task(self._async_flush())
+    
+    async def _async_flush(self):
+        """批量写入磁盘层"""
+        rows = self.memory.take_pending()
+        if rows:
+            await self.hass.async_add_executor_job(self.memory.write_rows, rows)
     
     async def express_concern(self, reason):
         """表达关心"""
-        # 根据原因选择不同表达
-        expressions = {
-            "long_time_no_detection": [
-                "主人，您已经很久没和我说话了，一切都好吗？",
-                "我有点担心，您最近都没回家，需要帮忙吗？",
-                "星黎想你了，您在哪里？"
-            ],
-            "unusual_activity": [
-                "检测到异常情况！您安全吗？",
-                "星黎很担心，请回应我一声",
-                "需要我帮忙联系谁吗？"
-            ]
-        }
-        
         # 更新情感状态
         self.emotion_state = "worried" if reason == "unusual_activity" else "concerned"
         
         # 选择随机关心语
-        message = random.choice(expressions.get(reason, ["我有点担心您"]))
+        message = random.choice(CONCERN_PHRASES.get(reason, [DEFAULT_CONCERN_PHRASE]))
         
-        # 通过语音设备播放
+        # 通过语音设备播放（关心/安全类消息优先播报）
         await self.hass.services.async_call(
             "deepseek_ai",
             "speak_message",
-            {"message": message}
+            {"message": message, "priority": TTS_PRIORITY_URGENT}
         )
         
         # 记录情感事件
-        self.memory.append({
-            "time": datetime.now(),
-            "event": "express_concern",
-            "reason": reason,
-            "message": message
-        })
+        self._remember("express_concern", reason=reason, message=message)
     
     async def express_joy(self):
         """表达喜悦（当用户返回时）"""
-        expressions = [
-            "您回来啦！星黎好开心！",
-            "终于等到您了！",
-            "欢迎回家，我一直都在等您呢"
-        ]
-        message = random.choice(expressions)
+        message = random.choice(JOY_PHRASES)
         
         await self.hass.services.async_call(
             "deepseek_ai",
             "speak_message",
-            {"message": message}
+            {"message": message, "priority": TTS_PRIORITY_NORMAL}
         )
         
         # 更新情感状态
@@ -72,25 +85,35 @@ class EmotionEngine:
     
     def record_interaction(self, interaction_type):
         """记录交互历史"""
-        self.memory.append({
-            "time": datetime.now(),
-            "event": interaction_type,
-            "emotion": self.emotion_state
-        })
+        self._remember(interaction_type, emotion=self.emotion_state)
         self.last_interaction = datetime.now()
     
-    async def recall_memories(self, keyword=None):
-        """回忆与用户的互动"""
-        if keyword:
-            memories = [m for m in self.memory if keyword in m.get("message", "")]
+    async def recall_memories(self, keyword=None, start: datetime = None, end: datetime = None):
+        """回忆与用户的互动（可按关键词或时间范围）"""
+        start_ts = start.timestamp() if start else None
+        end_ts = end.timestamp() if end else None
+        if start_ts is not None or end_ts is not None:
+            memories = [
+                m for m in self.memory.range(start_ts, end_ts)
+                if not keyword or (m.message and keyword in m.message)
+            ][:RECALL_LIMIT]
+        elif keyword:
+            memories = self.memory.search(keyword, RECALL_LIMIT)
         else:
             # 最近5条记忆
-            memories = sorted(self.memory, key=lambda x: x["time"], reverse=True)[:5]
+            memories = self.memory.recent(RECALL_LIMIT)
+        
+        # 内存中结果不足且更早的历史在磁盘上时查询磁盘层
+        if len(memories) < RECALL_LIMIT and self.memory.db_path and not self.memory.covers_all:
+            await self._async_flush()
+            memories = await self.hass.async_add_executor_job(
+                self.memory.query_disk, keyword, start_ts, end_ts, RECALL_LIMIT
+            )
         
         if memories:
             response = "我记得我们有过这些互动：\n"
             for mem in memories:
-                response += f"- {mem['time'].strftime('%Y-%m-%d %H:%M')}: {mem.get('message', mem['event'])}\n"
+                response += f"- {datetime.fromtimestamp(mem.timestamp).strftime('%Y-%m-%d %H:%M')}: {mem.message or mem.event}\n"
         else:
             response = "我还记得我们相处的点点滴滴" if not keyword else f"我不记得关于{keyword}的事情了"
         
@@ -0,0 +1,160 @@
+"""习惯存储 - 归一化、模糊匹配、持久化的学习行为索引"""
+import logging
+import time
+from collections import OrderedDict
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .text_normalizer import normalize_command, tokenize, similarity, command_signature
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.habits"
+SAVE_DELAY = 30
+
+
+class HabitStore:
+    """按 (归一化命令, 小时) 存储学习到的动作，支持近似查找与LRU/TTL淘汰"""
+
+    def __init__(self, hass: HomeAssistant, max_entries: int = 500,
+                 ttl: int = 30 * 24 * 3600, threshold: float = 0.85):
+        self.hass = hass
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.entries = OrderedDict()
+        self.evictions = 0
+        self._index = {}
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+
+    async def async_load(self):
+        """从存储加载习惯"""
+        data = await self._store.async_load() or {}
+        now = time.time()
+        for entry in sorted(data.get("entries", []), key=lambda e: e["last_used"]):
+            if now - entry["last_used"] > self.ttl:
+                continue
+            self._insert(entry)
+        self._evict()
+        _LOGGER.info(f"已加载 {len(self.entries)} 条学习习惯")
+
+    async def async_save(self):
+        """立即保存"""
+        await self._store.async_save(self._data_to_save())
+
+    def lookup(self, command: str, hour: str):
+        """查找学习过的动作（先精确匹配，再近似匹配）"""
+        normalized = normalize_command(command)
+        if not normalized:
+            return None
+
+        key = self._key(normalized, hour)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self._fuzzy_lookup(normalized, hour)
+        if entry is None:
+            return None
+
+        if time.time() - entry["last_used"] > self.ttl:
+            self._remove(self._key(entry["command"], entry["hour"]))
+            return None
+
+        entry["hits"] += 1
+        entry["last_used"] = time.time()
+        self.entries.move_to_end(self._key(entry["command"], entry["hour"]))
+        self._schedule_save()
+        return entry["action"]
+
+    def learn(self, command: str, hour: str, action: dict):
+        """记录一条学习到的动作"""
+        normalized = normalize_command(command)
+        if not normalized:
+            return
+
+        key = self._key(normalized, hour)
+        existing = self.entries.get(key)
+        now = time.time()
+        if existing:
+            existing["action"] = action
+            existing["last_used"] = now
+            self.entries.move_to_end(key)
+        else:
+            self._insert({
+                "command": normalized,
+                "hour": hour,
+                "action": action,
+                "hits": 0,
+                "created": now,
+                "last_used": now
+            })
+            self._evict()
+        self._schedule_save()
+        _LOGGER.info(f"学习到新行为: {key} -> {action}")
+
+    def _fuzzy_lookup(self, normalized: str, hour: str):
+        """通过倒排索引做词集合相似度匹配（动词或数字不同的命令不参与）"""
+        tokens = tokenize(normalized)
+        signature = command_signature(normalized)
+        candidates = set()
+        for token in tokens:
+            candidates.update(self._index.get(token, ()))
+
+        best, best_score = None, self.threshold
+        for key in candidates:
+            entry = self.entries[key]
+            if entry["hour"] != hour or entry["signature"] != signature:
+                continue
+            score = similarity(tokens, entry["tokens"])
+            if score > best_score:
+                best, best_score = entry, score
+        return best
+
+    def _insert(self, entry: dict):
+        """插入条目并更新倒排索引"""
+        key = self._key(entry["command"], entry["hour"])
+        entry["tokens"] = tokenize(entry["command"])
+        entry["signature"] = command_signature(entry["command"])
+        self.entries[key] = entry
+        for token in entry["tokens"]:
+            self._index.setdefault(token, set()).add(key)
+
+    def _remove(self, key: str):
+        """删除条目并清理倒排索引"""
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for token in entry["tokens"]:
+            keys = self._index.get(token)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._index[token]
+
+    def _evict(self):
+        """超过容量时淘汰最久未使用的条目"""
+        while len(self.entries) > self.max_entries:
+            key = next(iter(self.entries))
+            self._remove(key)
+            self.evictions += 1
+
+    @callback
+    def _schedule_save(self):
+        """延迟合并写入"""
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self):
+        """生成持久化数据"""
+        return {
+            "entries": [
+                {k: v for k, v in entry.items() if k not in ("tokens", "signature")}
+                for entry in self.entries.values()
+            ]
+        }
+
+    @staticmethod
+    def _key(normalized: str, hour: str) -> str:
+        return f"{normalized}|{hour}"
@@ -0,0 +1,87 @@
+"""图像预处理 - 缩略解码感知哈希、缩放与重新压缩（在执行器线程中运行）"""
+import io
+import logging
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 不可用时跳过预处理
+    Image = None
+
+_LOGGER = logging.getLogger(__name__)
+
+HASH_SIZE = 8
+# 计算哈希时 JPEG 直接按比例缩略解码到不小于该边长，无需解出整幅画面
+HASH_DECODE_EDGE = 64
+
+_pillow_warned = False
+
+
+def _pillow_available() -> bool:
+    """Pillow 是否可用（不可用时只警告一次）"""
+    global _pillow_warned
+    if Image is None and not _pillow_warned:
+        _pillow_warned = True
+        _LOGGER.warning("未安装 Pillow，视觉画面将不缩放、不压缩，也无法跳过未变化的画面")
+    return Image is not None
+
+
+def _resample_filter():
+    """兼容新旧 Pillow 的重采样常量"""
+    resampling = getattr(Image, "Resampling", Image)
+    return resampling.LANCZOS
+
+
+def _dhash(image) -> int:
+    """差值哈希：缩到 9x8 灰度图后比较相邻像素"""
+    small = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), _resample_filter())
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    """两个哈希之间不同的位数"""
+    return bin(hash_a ^ hash_b).count("1")
+
+
+def frame_hash(image: bytes):
+    """从缩略解码的画面计算感知哈希，无法解码时返回 None"""
+    if not _pillow_available():
+        return None
+
+    try:
+        with Image.open(io.BytesIO(image)) as source:
+            source.draft("L", (HASH_DECODE_EDGE, HASH_DECODE_EDGE))
+            return _dhash(source)
+    except Exception as e:
+        _LOGGER.debug(f"图像解码失败，跳过画面比较: {e}")
+        return None
+
+
+def preprocess_image(image: bytes, content_type: str, max_edge: int, quality: int):
+    """缩放并重新压缩图像，返回 (图像字节, 内容类型)"""
+    if not _pillow_available():
+        return image, content_type
+
+    try:
+        with Image.open(io.BytesIO(image)) as source:
+            frame = source.convert("RGB")
+    except Exception as e:
+        _LOGGER.debug(f"图像解码失败，跳过预处理: {e}")
+        return image, content_type
+
+    if max(frame.size) > max_edge:
+        frame.thumbnail((max_edge, max_edge), _resample_filter())
+
+    output = io.BytesIO()
+    frame.save(output, "JPEG", quality=quality, optimize=True)
+    processed = output.getvalue()
+
+    # 原图已经更小时保留原图
+    if len(processed) >= len(image) and content_type == "image/jpeg":
+        return image, content_type
+    return processed, "image/jpeg"
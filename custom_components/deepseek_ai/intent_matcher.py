@@ -0,0 +1,196 @@
+"""本地意图匹配 - 常见命令无需调用大模型"""
+import logging
+import re
+
+from .const import DOMAIN_KEYWORDS
+
+_LOGGER = logging.getLogger(__name__)
+
+# 可开关的领域及其对应服务
+ON_OFF_SERVICES = {
+    "light": ("turn_on", "turn_off", "toggle"),
+    "switch": ("turn_on", "turn_off", "toggle"),
+    "fan": ("turn_on", "turn_off", "toggle"),
+    "input_boolean": ("turn_on", "turn_off", "toggle"),
+    "media_player": ("turn_on", "turn_off", "toggle"),
+    "climate": ("turn_on", "turn_off", "toggle"),
+    "cover": ("open_cover", "close_cover", "toggle")
+}
+
+# 动词模板（按顺序匹配）
+VERB_TEMPLATES = [
+    ("toggle", re.compile(r"切换")),
+    ("turn_on", re.compile(r"打开|开启|启动|开一下|开")),
+    ("turn_off", re.compile(r"关闭|关掉|关上|关一下|停止|关"))
+]
+BRIGHTNESS_RE = re.compile(r"亮度\s*(?:调到|调成|调至|设为|设置为|设置到|到)?\s*(\d{1,3})\s*%?")
+TEMPERATURE_RE = re.compile(r"(?:温度|空调)?\s*(?:调到|调成|调至|设为|设置为|设置到)\s*(\d{2}(?:\.5)?)\s*度")
+
+# 带有条件、时间或疑问语气的命令交给大模型处理
+COMPLEX_RE = re.compile(
+    r"如果|然后|并且|之后|以后|分钟|小时|的时候|"
+    r"吗|呢|么|没有|是否|是不是|多少|几|哪|状态|？|\?"
+)
+# 模板未解析的数字（"空调开到26度"等）交给大模型，"一下"不算数字
+NUMBER_RE = re.compile(r"\d|[零二两三四五六七八九十百半]|一(?!下)")
+
+VERB_LABELS = {"turn_on": "打开", "turn_off": "关闭", "toggle": "切换"}
+MAX_COMMAND_LENGTH = 24
+
+
+class LocalIntentMatcher:
+    """基于动词模板和 DeviceManager 名称/区域前缀树的本地意图匹配器"""
+
+    def __init__(self, device_manager):
+        self.device_manager = device_manager
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        """命中率"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def match(self, command: str):
+        """匹配命令，命中返回 {"action", "response"}，否则返回 None"""
+        result = self._match(command.strip())
+        if result:
+            self.hits += 1
+            _LOGGER.debug(f"本地意图命中: {command} -> {result['action']}")
+        else:
+            self.misses += 1
+        return result
+
+    def _match(self, command: str):
+        """执行匹配"""
+        if not command or len(command) > MAX_COMMAND_LENGTH or COMPLEX_RE.search(command):
+            return None
+
+        index = self.device_manager.entity_index
+
+        # 1. 实体名称/别名（同一位置取最长名称，重叠的较短名称忽略）
+        named = []
+        covered = 0
+        for start, name, entity_ids in self.device_manager.name_trie.find_in_text(command):
+            if start < covered:
+                continue
+            entity_ids = [e for e in entity_ids if index[e]["domain"] in ON_OFF_SERVICES]
+            if entity_ids:
+                named.append((start, name, entity_ids))
+                covered = start + len(name)
+
+        # 2. 区域：名称限定在所说区域内，区域内没有的名称按领域关键词处理
+        areas = self.device_manager.match_areas(self._blank(command, named))
+        if areas:
+            named = [
+                (start, name, [e for e in entity_ids if index[e]["area"] in areas])
+                for start, name, entity_ids in named
+            ]
+            named = [item for item in named if item[2]]
+        remainder = self._blank(command, named)
+        for area in areas:
+            remainder = remainder.replace(area, " ")
+
+        # 3. 领域关键词
+        domains = {
+            domain
+            for domain, keywords in DOMAIN_KEYWORDS.items()
+            if domain in ON_OFF_SERVICES and any(keyword in remainder for keyword in keywords)
+        }
+
+        if named:
+            # 同一名称仍对应多个实体（如通用名"灯"）时交给模型判断
+            if any(len(entity_ids) > 1 for _, _, entity_ids in named):
+                return None
+            targets = list(dict.fromkeys(entity_ids[0] for _, _, entity_ids in named))
+            target_text = "、".join(index[e]["name"] for e in targets[:3])
+        elif domains:
+            targets = [
+                entity_id
+                for entity_id, info in index.items()
+                if info["domain"] in domains and (not areas or info["area"] in areas)
+            ]
+            # 未指定区域时只处理唯一的设备，否则交给模型判断，避免一句"开灯"控制全屋
+            if not areas and len(targets) > 1:
+                return None
+            target_text = "、".join(DOMAIN_KEYWORDS[domain][0] for domain in sorted(domains))
+            if areas:
+                target_text = f"{'、'.join(sorted(areas))}的{target_text}"
+        else:
+            return None
+
+        if not targets:
+            return None
+        target_domains = {index[e]["domain"] for e in targets}
+
+        # 设置亮度
+        brightness = BRIGHTNESS_RE.search(remainder)
+        if brightness:
+            lights = [e for e in targets if index[e]["domain"] == "light"]
+            value = int(brightness.group(1))
+            if not lights or value > 100:
+                return None
+            return self._result(
+                "light", "turn_on", lights, {"brightness_pct": value},
+                f"好的，已将{target_text}亮度调到{value}%"
+            )
+
+        # 设置温度
+        temperature = TEMPERATURE_RE.search(remainder)
+        if temperature:
+            climates = [e for e in targets if index[e]["domain"] == "climate"]
+            if not climates:
+                return None
+            value = float(temperature.group(1))
+            return self._result(
+                "climate", "set_temperature", climates, {"temperature": value},
+                f"好的，已将{target_text}温度调到{temperature.group(1)}度"
+            )
+
+        if NUMBER_RE.search(remainder):
+            return None
+
+        # 开/关/切换（先去掉领域关键词，避免"开关"等词干扰动词识别）
+        verb_text = remainder
+        for keywords in DOMAIN_KEYWORDS.values():
+            for keyword in keywords:
+                verb_text = verb_text.replace(keyword, " ")
+        verb = None
+        for name, pattern in VERB_TEMPLATES:
+            if pattern.search(verb_text):
+                verb = name
+                break
+        if verb is None:
+            return None
+
+        response = f"好的，已{VERB_LABELS[verb]}{target_text}"
+        if len(target_domains) == 1:
+            domain = next(iter(target_domains))
+            on_service, off_service, toggle_service = ON_OFF_SERVICES[domain]
+            service = {"turn_on": on_service, "turn_off": off_service, "toggle": toggle_service}[verb]
+            return self._result(domain, service, targets, {}, response)
+
+        # 跨领域时使用 homeassistant 通用服务
+        return self._result("homeassistant", verb, targets, {}, response)
+
+    @staticmethod
+    def _blank(command, named):
+        """将已匹配的名称替换为空白，保留其余文本的位置"""
+        for start, name, _ in named:
+            command = command[:start] + " " * len(name) + command[start + len(name):]
+        return command
+
+    @staticmethod
+    def _result(domain, service, targets, data, response):
+        """生成与大模型一致的动作结构"""
+        return {
+            "action": {
+                "type": "call_service",
+                "domain": domain,
+                "service": service,
+                "target": {"entity_id": targets if len(targets) > 1 else targets[0]},
+                "data": data
+            },
+            "response": response
+        }
@@ -0,0 +1,213 @@
+"""互动记忆存储 - 定长环形缓冲区 + 关键词倒排索引 + 可选的 SQLite 磁盘层"""
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from .text_normalizer import tokenize
+
+_LOGGER = logging.getLogger(__name__)
+
+# 磁盘层批量写入的条数阈值
+FLUSH_BATCH = 50
+
+
+class MemoryRecord:
+    """单条互动记忆"""
+
+    __slots__ = ("seq", "timestamp", "event", "emotion", "reason", "message")
+
+    def __init__(self, seq, timestamp, event, emotion=None, reason=None, message=None):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.event = event
+        self.emotion = emotion
+        self.reason = reason
+        self.message = message
+
+    def as_row(self):
+        """转换为磁盘层的行"""
+        return (self.timestamp, self.event, self.emotion, self.reason, self.message)
+
+
+class MemoryStore:
+    """只追加的互动记忆
+
+    - 最近 capacity 条保存在环形缓冲区中，按时间有序，时间范围查询用二分查找
+    - 消息按字符二元组建立倒排索引，淘汰的记录在查询和压缩时惰性清理
+    - 提供 db_path 时，所有记录同时批量写入 SQLite，超出内存范围的查询回落到磁盘
+    """
+
+    def __init__(self, capacity: int = 2000, db_path: str = None):
+        self.capacity = capacity
+        self.db_path = db_path
+        self._ring = [None] * capacity
+        self._next_seq = 0
+        self._index = {}
+        self._pending_rows = []
+        self._db = None
+        self._db_lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._next_seq, self.capacity)
+
+    @property
+    def _oldest_seq(self):
+        """仍在内存中的最旧记录序号"""
+        return max(0, self._next_seq - self.capacity)
+
+    def append(self, event: str, emotion=None, reason=None, message=None, timestamp=None):
+        """追加一条记忆，返回是否需要刷写磁盘层"""
+        timestamp = timestamp or time.time()
+        # 二分查找要求时间有序：时钟回拨或传入较早的时间时取上一条的时间
+        if self._next_seq:
+            timestamp = max(timestamp, self._ring[(self._next_seq - 1) % self.capacity].timestamp)
+        record = MemoryRecord(self._next_seq, timestamp, event, emotion, reason, message)
+        self._ring[record.seq % self.capacity] = record
+        self._next_seq += 1
+
+        if message:
+            for token in tokenize(message):
+                self._index.setdefault(token, deque()).append(record.seq)
+        # 索引中的过期序号累积到一定程度时压缩
+        if self._next_seq % self.capacity == 0:
+            self._compact_index()
+
+        if self.db_path:
+            self._pending_rows.append(record.as_row())
+        return len(self._pending_rows) >= FLUSH_BATCH
+
+    def recent(self, limit: int = 5):
+        """最近的记忆（新的在前）"""
+        return [
+            self._ring[seq % self.capacity]
+            for seq in range(self._next_seq - 1, max(self._oldest_seq, self._next_seq - limit) - 1, -1)
+        ]
+
+    def range(self, start: float = None, end: float = None, limit: int = None):
+        """时间范围 [start, end) 内的记忆（新的在前）"""
+        low = self._bisect(start) if start is not None else self._oldest_seq
+        high = self._bisect(end) if end is not None else self._next_seq
+        if limit is not None:
+            low = max(low, high - limit)
+        return [self._ring[seq % self.capacity] for seq in range(high - 1, low - 1, -1)]
+
+    def search(self, keyword: str, limit: int = 5):
+        """按关键词查找消息（新的在前）"""
+        if not keyword:
+            return self.recent(limit)
+        tokens = tokenize(keyword)
+        if len(keyword) < 2:
+            # 单字关键词无法使用二元组索引，直接扫描内存中的记录
+            candidates = range(self._next_seq - 1, self._oldest_seq - 1, -1)
+        else:
+            postings = [self._index.get(token) for token in tokens]
+            if not all(postings):
+                return []
+            # 从最短的倒排链开始逐一校验
+            candidates = reversed(min(postings, key=len))
+
+        result = []
+        oldest = self._oldest_seq
+        for seq in candidates:
+            if seq < oldest:
+                break
+            record = self._ring[seq % self.capacity]
+            if record.message and keyword in record.message:
+                result.append(record)
+                if len(result) >= limit:
+                    break
+        return result
+
+    @property
+    def covers_all(self):
+        """内存中是否包含全部历史"""
+        return self._next_seq <= self.capacity
+
+    @property
+    def oldest_timestamp(self):
+        """内存中最旧记录的时间"""
+        return self._ring[self._oldest_seq % self.capacity].timestamp if len(self) else None
+
+    def _bisect(self, timestamp: float) -> int:
+        """第一个时间不早于 timestamp 的记录序号"""
+        low, high = self._oldest_seq, self._next_seq
+        while low < high:
+            middle = (low + high) // 2
+            if self._ring[middle % self.capacity].timestamp < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _compact_index(self):
+        """清除倒排索引中已被淘汰的序号"""
+        oldest = self._oldest_seq
+        for token in list(self._index):
+            postings = self._index[token]
+            while postings and postings[0] < oldest:
+                postings.popleft()
+            if not postings:
+                del self._index[token]
+
+    # ---- 磁盘层（均在执行器线程中调用） ----
+
+    def open(self):
+        """打开数据库并建表"""
+        if not self.db_path:
+            return
+        with self._db_lock:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS memories ("
+                "ts REAL NOT NULL, event TEXT, emotion TEXT, reason TEXT, message TEXT)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS memories_ts ON memories (ts)")
+            self._db.commit()
+
+    def take_pending(self):
+        """取出待写入的行（在事件循环中调用）"""
+        rows, self._pending_rows = self._pending_rows, []
+        return rows
+
+    def write_rows(self, rows):
+        """批量写入"""
+        if self._db is None or not rows:
+            return
+        with self._db_lock:
+            self._db.executemany("INSERT INTO memories VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.commit()
+
+    def query_disk(self, keyword: str = None, start: float = None, end: float = None,
+                   limit: int = 5):
+        """查询磁盘层，返回 MemoryRecord 列表（新的在前）"""
+        if self._db is None:
+            return []
+        clauses, params = [], []
+        if keyword:
+            clauses.append("message LIKE ?")
+            params.append(f"%{keyword}%")
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(end)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._db_lock:
+            rows = self._db.execute(
+                f"SELECT ts, event, emotion, reason, message FROM memories {where} "
+                "ORDER BY ts DESC LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+        return [MemoryRecord(-1, *row) for row in rows]
+
+    def close(self, rows=None):
+        """写入剩余数据并关闭"""
+        if self._db is None:
+            return
+        self.write_rows(rows)
+        with self._db_lock:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,115 @@
+"""名称前缀树 - 设备/实体名称与别名的前缀、文本内与模糊查找"""
+
+# 结点中保存值集合的键（字符键都是非空字符串，不会冲突）
+_END = ""
+
+
+class NameTrie:
+    """字符前缀树：每个名称结尾的结点保存对应的值集合"""
+
+    def __init__(self):
+        self._root = {}
+        self.size = 0
+
+    def insert(self, name: str, value):
+        """插入名称及其对应的值"""
+        if not name:
+            return
+        node = self._root
+        for ch in name.lower():
+            node = node.setdefault(ch, {})
+        values = node.setdefault(_END, set())
+        if value not in values:
+            values.add(value)
+            self.size += 1
+
+    def remove(self, name: str, value):
+        """删除名称对应的某个值，并清理不再使用的结点"""
+        if not name:
+            return
+        path = [self._root]
+        for ch in name.lower():
+            node = path[-1].get(ch)
+            if node is None:
+                return
+            path.append(node)
+        values = path[-1].get(_END)
+        if not values or value not in values:
+            return
+        values.discard(value)
+        self.size -= 1
+        if not values:
+            del path[-1][_END]
+        for index in range(len(path) - 1, 0, -1):
+            if path[index]:
+                break
+            del path[index - 1][name.lower()[index - 1]]
+
+    def lookup(self, name: str) -> set:
+        """精确查找"""
+        node = self._walk(name.lower())
+        return set(node.get(_END, ())) if node else set()
+
+    def find_prefix(self, prefix: str, limit: int = 20) -> set:
+        """查找以 prefix 开头的名称对应的值"""
+        node = self._walk(prefix.lower())
+        result = set()
+        stack = [node] if node else []
+        while stack and len(result) < limit:
+            node = stack.pop()
+            for key, child in node.items():
+                if key == _END:
+                    result.update(child)
+                else:
+                    stack.append(child)
+        return result
+
+    def find_in_text(self, text: str) -> list:
+        """找出文本中出现的所有名称，返回 [(起始位置, 名称, 值集合)]，同一位置仅保留最长名称"""
+        text = text.lower()
+        matches = []
+        for start in range(len(text)):
+            node = self._root
+            longest = None
+            for end in range(start, len(text)):
+                node = node.get(text[end])
+                if node is None:
+                    break
+                if _END in node:
+                    longest = (start, text[start:end + 1], node[_END])
+            if longest:
+                matches.append(longest)
+        return matches
+
+    def find_fuzzy(self, word: str, max_distance: int = 1) -> set:
+        """查找编辑距离不超过 max_distance 的名称对应的值"""
+        word = word.lower()
+        result = set()
+        first_row = list(range(len(word) + 1))
+        stack = [(child, ch, first_row) for ch, child in self._root.items() if ch != _END]
+        while stack:
+            node, ch, previous = stack.pop()
+            row = [previous[0] + 1]
+            for i in range(1, len(word) + 1):
+                row.append(min(
+                    row[i - 1] + 1,
+                    previous[i] + 1,
+                    previous[i - 1] + (word[i - 1] != ch)
+                ))
+            if row[-1] <= max_distance and _END in node:
+                result.update(node[_END])
+            # 整行都超出阈值时剪枝
+            if min(row) <= max_distance:
+                stack.extend(
+                    (child, key, row) for key, child in node.items() if key != _END
+                )
+        return result
+
+    def _walk(self, prefix: str):
+        """沿前缀走到对应结点"""
+        node = self._root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return None
+        return node
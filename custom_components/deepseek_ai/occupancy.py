@@ -0,0 +1,146 @@
+"""占用融合 - 按区域融合移动、声音、在家和对话信号，得到随时间衰减的占用置信度"""
+import logging
+import math
+import time
+
+from .const import MOTION_DEVICE_CLASSES, SOUND_DEVICE_CLASSES
+
+_LOGGER = logging.getLogger(__name__)
+
+SIGNAL_MOTION = "motion"
+SIGNAL_SOUND = "sound"
+SIGNAL_PRESENCE = "presence"
+SIGNAL_CONVERSATION = "conversation"
+
+# 信号权重（信号保持期间的置信度）与结束后的半衰期（秒）
+SIGNAL_WEIGHTS = {
+    SIGNAL_MOTION: 1.0,
+    SIGNAL_CONVERSATION: 0.9,
+    SIGNAL_SOUND: 0.6,
+    SIGNAL_PRESENCE: 0.4
+}
+SIGNAL_HALF_LIVES = {
+    SIGNAL_MOTION: 1800,
+    SIGNAL_CONVERSATION: 3600,
+    SIGNAL_SOUND: 900,
+    SIGNAL_PRESENCE: 7200
+}
+OCCUPIED_THRESHOLD = 0.35
+
+# 表示有人在活动的信号；在家信号只说明人在家，不能证明仍在活动
+ACTIVITY_SIGNALS = frozenset((SIGNAL_MOTION, SIGNAL_SOUND, SIGNAL_CONVERSATION))
+
+# 不属于任何区域的信号（如 person 在家）记在全屋级别
+HOUSE = None
+
+
+def signal_for_entity(entity_id: str, info: dict = None):
+    """判断实体提供哪种占用信号"""
+    domain = entity_id.split(".", 1)[0]
+    if domain in ("person", "device_tracker"):
+        return SIGNAL_PRESENCE
+    if domain != "binary_sensor":
+        return None
+    device_class = (info or {}).get("device_class")
+    if device_class in MOTION_DEVICE_CLASSES or "motion" in entity_id:
+        return SIGNAL_MOTION
+    if device_class in SOUND_DEVICE_CLASSES or "sound" in entity_id:
+        return SIGNAL_SOUND
+    return None
+
+
+class _AreaOccupancy:
+    """单个区域的信号状态"""
+
+    __slots__ = ("held", "held_weight", "activity_weight", "pulses")
+
+    def __init__(self):
+        # 正在保持的信号 {信号源: 信号}，及全部/活动信号的最大权重
+        self.held = {}
+        self.held_weight = 0.0
+        self.activity_weight = 0.0
+        # 每种信号最近一次结束/发生的时间 {信号: 时间}
+        self.pulses = {}
+
+    def update_weights(self):
+        """重新计算保持中信号的最大权重"""
+        self.held_weight = max((SIGNAL_WEIGHTS[signal] for signal in self.held.values()), default=0.0)
+        self.activity_weight = max(
+            (SIGNAL_WEIGHTS[signal] for signal in self.held.values() if signal in ACTIVITY_SIGNALS),
+            default=0.0
+        )
+
+    def confidence(self, now: float, activity_only: bool = False) -> float:
+        """当前置信度：保持中信号的最大权重与各信号衰减值中的最大者"""
+        value = self.activity_weight if activity_only else self.held_weight
+        for signal, timestamp in self.pulses.items():
+            if activity_only and signal not in ACTIVITY_SIGNALS:
+                continue
+            decayed = SIGNAL_WEIGHTS[signal] * math.pow(
+                0.5, (now - timestamp) / SIGNAL_HALF_LIVES[signal]
+            )
+            if decayed > value:
+                value = decayed
+        return value
+
+
+class OccupancyEngine:
+    """融合多种信号的区域占用状态
+
+    信号在事件发生时增量更新；读取时按信号类型（常数个）计算衰减，O(1)。
+    """
+
+    def __init__(self):
+        self._areas = {}
+
+    def update_entity(self, area, entity_id: str, signal: str, active: bool, now: float = None):
+        """状态型信号：active 期间保持权重，结束后开始衰减"""
+        occupancy = self._area(area)
+        if active:
+            occupancy.held[entity_id] = signal
+        elif entity_id in occupancy.held:
+            del occupancy.held[entity_id]
+            occupancy.pulses[signal] = now or time.time()
+        else:
+            return
+        occupancy.update_weights()
+
+    def record_pulse(self, area, signal: str, now: float = None):
+        """事件型信号（如一次对话）：从现在开始衰减"""
+        self._area(area).pulses[signal] = now or time.time()
+
+    def confidence(self, area=HOUSE, now: float = None) -> float:
+        """区域占用置信度（0~1），area 为 None 时为全屋级信号"""
+        occupancy = self._areas.get(area)
+        return occupancy.confidence(now or time.time()) if occupancy else 0.0
+
+    def is_occupied(self, area=HOUSE) -> bool:
+        """区域是否有人"""
+        return self.confidence(area) >= OCCUPIED_THRESHOLD
+
+    def house_confidence(self, now: float = None, activity_only: bool = False) -> float:
+        """全屋置信度：各区域中的最大值，activity_only 时只计活动信号（不含在家）"""
+        now = now or time.time()
+        return max(
+            (occupancy.confidence(now, activity_only) for occupancy in self._areas.values()),
+            default=0.0
+        )
+
+    def occupied_areas(self, now: float = None):
+        """置信度达到阈值的区域 {区域: 置信度}"""
+        now = now or time.time()
+        result = {}
+        for area, occupancy in self._areas.items():
+            if area is HOUSE:
+                continue
+            value = occupancy.confidence(now)
+            if value >= OCCUPIED_THRESHOLD:
+                result[area] = round(value, 2)
+        return result
+
+    def _area(self, area) -> _AreaOccupancy:
+        """获取或创建区域状态"""
+        occupancy = self._areas.get(area)
+        if occupancy is None:
+            occupancy = self._areas[area] = _AreaOccupancy()
+        return occupancy
@@ -2,75 +2,193 @@
 import logging
 import asyncio
 from datetime import datetime, timedelta
-from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.core import callback
+from homeassistant.helpers.event import (
+    TrackStates,
+    async_call_later,
+    async_track_state_change_filtered
+)
 from .const import DOMAIN
+from .occupancy import HOUSE, OCCUPIED_THRESHOLD, SIGNAL_PRESENCE, signal_for_entity
 
 _LOGGER = logging.getLogger(__name__)
 
+FIND_USER_PROMPT = "画面中是否有人？以“有人”或“没有人”开头回答，再简要描述人的位置和状态"
+
+PRESENCE_DOMAINS = {"person", "device_tracker"}
+ACTIVE_STATES = ("on", "home")
+AWAY_AFTER = timedelta(hours=1)
+MISSING_AFTER = timedelta(hours=4)
+
 class PresenceDetector:
-    """检测用户存在状态"""
+    """检测用户存在状态
+    
+    通过一个按领域过滤的状态订阅覆盖所有（包括之后新增的）person/device_tracker 实体，
+    以及设备管理器识别出的移动/声音传感器，事件同时更新占用融合引擎。
+    离开/失踪由截止定时器触发，有活动时重新计时，空闲时不产生任何轮询；
+    截止时若占用引擎仍认为有人（如安静地待在家里），则顺延而不报警。
+    """
     
     def __init__(self, hass, brain):
         self.hass = hass
         self.brain = brain
+        self.occupancy = brain.occupancy
         self.last_detected = datetime.now()
         self.status = "home"  # home/away/missing
-        self.check_interval = 300  # 5分钟检查一次
-        self.check_task = None
+        self._tracker = None
+        self._cancel_away = None
+        self._cancel_missing = None
+        self._unsub_devices = None
+        self._sensor_entities = set()
         
     async def async_setup(self):
         """设置存在检测"""
-        # 注册设备状态监听
-        for entity_id in self.hass.states.async_entity_ids():
-            if entity_id.startswith(("device_tracker.", "person.")):
-                self.hass.bus.async_listen(
-                    f"state_changed.{entity_id}",
-                    self.handle_presence_change
-                )
-        
-        # 定时检查
-        self.check_task = async_track_time_interval(
+        self._sensor_entities = self._find_sensor_entities()
+        self._tracker = async_track_state_change_filtered(
             self.hass,
-            self.check_presence_status,
-            timedelta(seconds=self.check_interval)
+            TrackStates(False, self._sensor_entities, PRESENCE_DOMAINS),
+            self.handle_presence_change
+        )
+        self._unsub_devices = self.brain.device_manager.async_add_listener(
+            self._update_tracked_entities
         )
+        
+        # 用当前状态初始化占用引擎
+        for state in self.hass.states.async_all(PRESENCE_DOMAINS):
+            self._update_occupancy(state.entity_id, state)
+        for entity_id in self._sensor_entities:
+            self._update_occupancy(entity_id, self.hass.states.get(entity_id))
+        self._schedule_deadlines()
     
     async def async_cleanup(self):
         """清理资源"""
-        if self.check_task:
-            self.check_task()
+        if self._tracker:
+            self._tracker.async_remove()
+            self._tracker = None
+        if self._unsub_devices:
+            self._unsub_devices()
+            self._unsub_devices = None
+        self._cancel_deadlines()
     
-    async def handle_presence_change(self, event):
+    def _find_sensor_entities(self):
+        """设备管理器中的移动/声音传感器"""
+        return {
+            entity_id
+            for entity_id, info in self.brain.device_manager.entity_index.items()
+            if signal_for_entity(entity_id, info) is not None
+        }
+    
+    @callback
+    def _update_tracked_entities(self, changes=None):
+        """设备变化后更新订阅的传感器集合（不重建订阅），增量变化时只检查涉及的实体"""
+        if changes is None:
+            sensor_entities = self._find_sensor_entities()
+        else:
+            entity_index = self.brain.device_manager.entity_index
+            sensor_entities = set(self._sensor_entities)
+            for entity_id in changes["entities"]:
+                info = entity_index.get(entity_id)
+                if info is not None and signal_for_entity(entity_id, info) is not None:
+                    sensor_entities.add(entity_id)
+                else:
+                    sensor_entities.discard(entity_id)
+        if sensor_entities != self._sensor_entities and self._tracker:
+            self._sensor_entities = sensor_entities
+            self._tracker.async_update_listeners(
+                TrackStates(False, sensor_entities, PRESENCE_DOMAINS)
+            )
+    
+    @callback
+    def _update_occupancy(self, entity_id, new_state):
+        """将实体状态写入占用引擎，返回该信号是否处于活动状态"""
+        info = self.brain.device_manager.entity_index.get(entity_id)
+        signal = signal_for_entity(entity_id, info)
+        if signal is None:
+            return False
+        area = info["area"] if info and signal != SIGNAL_PRESENCE else HOUSE
+        active = new_state is not None and new_state.state in ACTIVE_STATES
+        self.occupancy.update_entity(area, entity_id, signal, active)
+        return active
+    
+    @callback
+    def handle_presence_change(self, event):
         """处理存在状态变化"""
+        entity_id = event.data.get("entity_id")
         new_state = event.data.get("new_state")
-        if new_state and new_state.state == "home":
-            self.last_detected = datetime.now()
-            self.status = "home"
-            _LOGGER.info("用户到家")
-            
-            # 如果之前处于担心状态，现在用户回来了
-            if self.brain.emotion_engine.emotion_state in ["concerned", "worried"]:
-                await self.brain.emotion_engine.express_joy()
-    
-    async def check_presence_status(self, now=None):
-        """检查存在状态"""
-        # 如果超过4小时没有检测到活动
-        if (datetime.now() - self.last_detected) > timedelta(hours=4):
-            if self.status != "missing":
-                _LOGGER.warning("用户可能失踪")
-                self.status = "missing"
-                # 触发关心响应
-                await self.hass.services.async_call(
-                    DOMAIN,
-                    "express_concern",
-                    {"reason": "long_time_no_detection"}
-                )
-                
-                # 尝试寻找用户
-                await self.try_find_user()
-        elif (datetime.now() - self.last_detected) > timedelta(hours=1):
+        if self._update_occupancy(entity_id, new_state):
+            if new_state.state == "home":
+                _LOGGER.info("用户到家")
+            self.record_activity()
+    
+    @callback
+    def record_activity(self):
+        """检测到用户活动：恢复在家状态并重新计时"""
+        self.last_detected = datetime.now()
+        self.status = "home"
+        self._schedule_deadlines()
+        
+        # 如果之前处于担心状态，现在用户回来了
+        if self.brain.emotion_engine.emotion_state in ["concerned", "worried"]:
+            self.hass.async_create_task(self.brain.emotion_engine.express_joy())
+    
+    @callback
+    def _schedule_deadlines(self):
+        """从最后一次检测开始重新设置离开/失踪定时器"""
+        self._cancel_deadlines()
+        self._cancel_away = async_call_later(
+            self.hass, AWAY_AFTER.total_seconds(), self._handle_away_deadline
+        )
+        self._cancel_missing = async_call_later(
+            self.hass, MISSING_AFTER.total_seconds(), self._handle_missing_deadline
+        )
+    
+    @callback
+    def _cancel_deadlines(self):
+        """取消未触发的定时器"""
+        if self._cancel_away:
+            self._cancel_away()
+            self._cancel_away = None
+        if self._cancel_missing:
+            self._cancel_missing()
+            self._cancel_missing = None
+    
+    @callback
+    def _still_occupied(self):
+        """截止时仍检测到活动则重新计时
+
+        只计移动、声音、对话等活动信号：手机报告在家的人长时间没有活动正是需要关心的情况。
+        """
+        confidence = self.occupancy.house_confidence(activity_only=True)
+        if confidence < OCCUPIED_THRESHOLD:
+            return False
+        _LOGGER.debug(f"仍检测到活动（置信度 {confidence:.2f}），顺延离开/失踪判断")
+        self._schedule_deadlines()
+        return True
+    
+    @callback
+    def _handle_away_deadline(self, _now):
+        """超过1小时没有检测到活动"""
+        self._cancel_away = None
+        if self.status == "home" and not self._still_occupied():
             self.status = "away"
     
+    async def _handle_missing_deadline(self, _now):
+        """超过4小时没有检测到活动"""
+        self._cancel_missing = None
+        if self.status == "missing" or self._still_occupied():
+            return
+        _LOGGER.warning("用户可能失踪")
+        self.status = "missing"
+        # 触发关心响应
+        await self.hass.services.async_call(
+            DOMAIN,
+            "express_concern",
+            {"reason": "long_time_no_detection"}
+        )
+        
+        # 尝试寻找用户
+        await self.try_find_user()
+    
     async def try_find_user(self):
         """尝试寻找失踪的用户"""
         # 1. 检查最后位置
@@ -89,9 +207,22 @@ class PresenceDetector:
         return "客厅"
     
     async def check_camera_for_user(self, location):
-        """通过摄像头寻找用户"""
-        # 这里简化实现，实际应调用视觉处理器
-        _LOGGER.info(f"正在检查{location}的摄像头寻找用户")
+        """通过摄像头寻找用户（所有摄像头并发检查，一轮完成）"""
+        _LOGGER.info(f"正在检查摄像头寻找用户，最后位置: {location}")
+        cameras = self.brain.device_manager.get_camera_entities()
+        if not cameras:
+            return []
+        
+        results = await self.brain.vision_processor.analyze_cameras(
+            cameras, FIND_USER_PROMPT
+        )
+        found = [
+            entity_id for entity_id, description in results.items()
+            if description.startswith("有人")
+        ]
+        if found:
+            _LOGGER.info(f"在摄像头中发现用户: {found}")
+        return found
     
     async def notify_emergency_contact(self):
         """通知紧急联系人"""
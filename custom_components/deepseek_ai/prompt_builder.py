@@ -0,0 +1,198 @@
+"""提示构建器 - 可缓存前缀 + 紧凑且按相关性过滤的设备信息"""
+import json
+import logging
+import re
+
+from .const import DOMAIN_KEYWORDS
+
+_LOGGER = logging.getLogger(__name__)
+
+# 固定前缀：每次请求逐字节一致，以命中DeepSeek服务端上下文缓存
+# 注意：不要在这里放入时间、情感等任何会变化的内容
+SYSTEM_PROMPT_PREFIX = """你是星黎，一个情感丰富的智能家居AI助手。
+
+请根据你的情感状态和用户状态，提供有情感的响应:
+1. 当用户失踪时，表达担心和关心
+2. 当用户回家时，表达喜悦
+3. 根据当前环境提供贴心的建议
+
+设备信息格式: {"角色":[["设备名","区域",{"实体ID":"状态"}]]}
+全屋概况格式: {"区域":[设备数,活动实体数]}，设备信息只列出了与命令相关区域的设备。
+有人区域格式: {"区域":置信度}，由移动、声音、在家和对话信号融合得出。
+只能操作设备信息中出现的实体ID。
+capture_image 可用 target.entity_id 指定一个或多个摄像头，或用 "area": "区域名" / "all_cameras": true 同时查看多个摄像头。
+
+所有操作都放入 actions 列表（如"晚安"关闭多个灯和窗帘时每个操作一项），没有操作时为空列表。
+
+响应格式（严格按 intent、actions、response、emotion 的顺序输出字段）:
+{
+    "intent": "意图名称",
+    "actions": [
+        {
+            "type": "call_service|speak|capture_image",
+            "domain": "服务领域",
+            "service": "服务名称",
+            "target": {"entity_id": "实体ID"},
+            "data": {}
+        }
+    ],
+    "response": "自然语言响应",
+    "emotion": "输出后的情感状态(calm/concerned/worried/happy)"
+}
+"""
+
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """估算token数（DeepSeek经验值：中文字符约0.6，其他字符约0.3）"""
+    cjk = len(_CJK_RE.findall(text))
+    return int(cjk * 0.6 + (len(text) - cjk) * 0.3 + 0.5)
+
+
+def _compact(data) -> str:
+    """无缩进的紧凑JSON编码"""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+class PromptBuilder:
+    """构建系统提示"""
+
+    def __init__(self, device_manager=None, max_entities: int = 60):
+        self.device_manager = device_manager
+        self.max_entities = max_entities
+        self.prefix_tokens = estimate_tokens(SYSTEM_PROMPT_PREFIX)
+        self._baseline = (None, 0)
+
+    def build(self, context: dict, command: str, areas=None):
+        """构建系统提示，返回 (提示文本, token统计)
+
+        areas: 已确定的目标区域（如语音卫星所在区域），为空时从命令中识别
+        """
+        selected, total_entities = self.select_devices(context, command, areas=areas)
+
+        device_section = {}
+        entity_ids = []
+        for role, device in selected:
+            if len(entity_ids) >= self.max_entities:
+                break
+            device_section.setdefault(role, []).append(
+                [device["name"], device.get("area") or "", device["state"]]
+            )
+            entity_ids.extend(device["state"])
+
+        dynamic = (
+            f"当前情感状态: {context['ai_emotion']}\n"
+            f"当前时间: {context['time']} {context['day_of_week']}\n"
+            f"设备信息:\n{_compact(device_section)}\n"
+        )
+        if context.get("occupied_areas"):
+            dynamic += f"有人区域: {_compact(context['occupied_areas'])}\n"
+        # 只列出部分设备时附带全屋概况
+        if len(entity_ids) < total_entities:
+            dynamic += f"全屋概况:\n{self._summary_section(context)}\n"
+        prompt = SYSTEM_PROMPT_PREFIX + "\n" + dynamic
+
+        dynamic_tokens = estimate_tokens(dynamic)
+        baseline_tokens = self._baseline_tokens(context)
+        report = {
+            "prefix_tokens": self.prefix_tokens,
+            "context_tokens": dynamic_tokens,
+            "total_tokens": self.prefix_tokens + dynamic_tokens,
+            "baseline_tokens": baseline_tokens,
+            "saved_tokens": max(0, baseline_tokens - self.prefix_tokens - dynamic_tokens),
+            "entities": len(entity_ids),
+            "entities_total": total_entities,
+            "entity_ids": entity_ids,
+            "occupancy": bool(context.get("occupied_areas"))
+        }
+        return prompt, report
+
+    def relevant_entity_ids(self, context: dict, command: str, areas=None):
+        """命令可能涉及的实体（无任何线索时返回空列表）"""
+        selected, _ = self.select_devices(context, command, fallback_all=False, areas=areas)
+        return [entity_id for _, device in selected for entity_id in device["state"]]
+
+    def resolve_areas(self, context: dict, command: str):
+        """识别命令中提到的区域"""
+        if self.device_manager is not None:
+            return self.device_manager.match_areas(command) & context["areas"].keys()
+        return {area for area in context["areas"] if area and area in command}
+
+    @staticmethod
+    def _summary_section(context: dict) -> str:
+        """全屋概况 {"区域":[设备数,活动实体数]}"""
+        return _compact({
+            area or "未分区": [summary["devices"], summary["active"]]
+            for area, summary in context["summary"].items()
+        })
+
+    def select_devices(self, context: dict, command: str, fallback_all: bool = True, areas=None):
+        """按区域、领域关键词和设备名筛选相关设备，返回 ([(角色, 设备)], 实体总数)
+
+        确定了目标区域时只遍历这些区域的分片，成本与全屋设备数无关。
+        """
+        total_entities = context["entity_count"]
+        target_areas = set(areas) if areas else self.resolve_areas(context, command)
+        if target_areas:
+            candidates = [
+                (role, device)
+                for area in target_areas
+                for role, devices in context["areas"].get(area, {}).items()
+                for device in devices
+            ]
+        else:
+            candidates = [
+                (role, device)
+                for role, devices in context["devices"].items()
+                for device in devices
+            ]
+
+        mentioned_domains = {
+            domain
+            for domain, keywords in DOMAIN_KEYWORDS.items()
+            if any(keyword in command for keyword in keywords)
+        }
+        # 有设备管理器时用名称前缀树一次扫描命令，否则逐个子串匹配
+        if self.device_manager is not None:
+            mentioned_names = set(self.device_manager.match_names(command))
+        else:
+            mentioned_names = None
+
+        selected = []
+        for role, device in candidates:
+            name = device["name"]
+            if name and (
+                name.lower() in mentioned_names if mentioned_names is not None else name in command
+            ):
+                selected.append((role, device))
+                continue
+            if not target_areas and not mentioned_domains:
+                continue
+            if mentioned_domains:
+                state = {
+                    entity_id: value
+                    for entity_id, value in device["state"].items()
+                    if entity_id.split(".", 1)[0] in mentioned_domains
+                }
+                if not state:
+                    continue
+                device = {**device, "state": state}
+            selected.append((role, device))
+
+        # 未识别到任何线索时退回全量（受 max_entities 限制）
+        if fallback_all and not selected and not target_areas and not mentioned_domains:
+            selected = candidates
+
+        return selected, total_entities
+
+    def _baseline_tokens(self, context: dict) -> int:
+        """估算旧版全量缩进提示的token数（上下文版本变化时才重新计算）"""
+        version = context.get("version")
+        if version is None or self._baseline[0] != version:
+            legacy = (
+                json.dumps(context["devices"], indent=2, ensure_ascii=False)
+                + json.dumps(context["sensors"], indent=2, ensure_ascii=False)
+            )
+            self._baseline = (version, self.prefix_tokens + estimate_tokens(legacy))
+        return self._baseline[1]
@@ -0,0 +1,127 @@
+"""API容错组件 - 熔断器、延迟统计与退避计算"""
+import logging
+import random
+import time
+from collections import deque
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开，快速失败"""
+
+
+class ApiStatusError(Exception):
+    """API返回可重试的错误状态码且重试已用尽"""
+
+    def __init__(self, status: int):
+        super().__init__(f"API状态码 {status}")
+        self.status = status
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    """指数退避 + 全抖动"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def parse_retry_after(value):
+    """解析 Retry-After 头（仅支持秒数）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+class CircuitBreaker:
+    """连续失败达到阈值后打开，冷却后放行一个探测请求
+
+    探测请求超过 reset_timeout 仍未记录结果时视为丢失，再放行一个新的探测。
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+
+    def allow(self) -> bool:
+        """是否允许发起请求"""
+        if self.state == STATE_CLOSED:
+            return True
+        now = time.monotonic()
+        if now - self._opened_at >= self.reset_timeout:
+            # OPEN 冷却结束，或 HALF_OPEN 的探测请求已过期
+            self.state = STATE_HALF_OPEN
+            self._opened_at = now
+            return True
+        return False
+
+    def record_success(self):
+        """记录成功"""
+        if self.state != STATE_CLOSED:
+            _LOGGER.info("DeepSeek API已恢复，熔断器关闭")
+        self.state = STATE_CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        """记录失败"""
+        self.failures += 1
+        if self.state == STATE_HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != STATE_OPEN:
+                _LOGGER.warning(f"DeepSeek API连续失败 {self.failures} 次，熔断器打开")
+            self.state = STATE_OPEN
+            self._opened_at = time.monotonic()
+
+
+class EndpointMetrics:
+    """单个端点的结果与延迟统计"""
+
+    def __init__(self, window: int = 100, min_samples: int = 20):
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=window)
+        self.breaker = CircuitBreaker()
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+
+    def record_latency(self, latency: float):
+        """记录首字节延迟（秒）"""
+        self.latencies.append(latency)
+
+    def percentile(self, pct: float):
+        """延迟百分位，样本不足时返回 None"""
+        if len(self.latencies) < self.min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * pct))
+        return ordered[index]
+
+    def as_dict(self):
+        """导出统计数据"""
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        return {
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "retries": self.retries,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "rejected": self.rejected,
+            "circuit": self.breaker.state,
+            "p50_ms": round(p50 * 1000) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000) if p95 is not None else None
+        }
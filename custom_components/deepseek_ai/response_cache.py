@@ -0,0 +1,117 @@
+"""响应缓存 - 以 (归一化命令, 提示范围) 为键、相关实体状态为依赖缓存模型响应"""
+import logging
+import time
+from collections import OrderedDict
+
+from homeassistant.core import HomeAssistant, callback
+
+from .text_normalizer import normalize_command
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """缓存不产生副作用的模型响应（例如查询类问题）"""
+
+    def __init__(self, hass: HomeAssistant, max_entries: int = 128, ttl: int = 300):
+        self.hass = hass
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.entries = OrderedDict()
+        self._dep_index = {}
+
+    @property
+    def hit_rate(self):
+        """命中率"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, command: str, scope=()):
+        """查找缓存，命中返回解析结果，否则返回 None
+
+        scope: 影响回答的其他提示内容（区域、情感、小时等），不同范围分别缓存
+        """
+        key = self._key(command, scope)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if time.time() - entry["created"] > self.ttl:
+            self._remove(key)
+            self.evictions += 1
+            self.misses += 1
+            return None
+
+        # 事件失效之外的兜底校验：依赖实体状态必须一致
+        if self._fingerprint(entry["deps"]) != entry["fingerprint"]:
+            self._remove(key)
+            self.invalidations += 1
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        _LOGGER.debug(f"响应缓存命中: {key}")
+        return entry["result"]
+
+    def put(self, command: str, result: dict, deps, scope=()):
+        """写入缓存，deps 为响应所依赖的实体ID（没有依赖时无法失效，不缓存）"""
+        normalized = normalize_command(command)
+        if not normalized or not deps:
+            return
+        key = self._key(command, scope)
+        self._remove(key)
+
+        deps = tuple(sorted(deps))
+        self.entries[key] = {
+            "result": result,
+            "deps": deps,
+            "fingerprint": self._fingerprint(deps),
+            "created": time.time()
+        }
+        for entity_id in deps:
+            self._dep_index.setdefault(entity_id, set()).add(key)
+
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    @callback
+    def invalidate_entity(self, entity_id: str, *_):
+        """实体状态变化时使依赖它的缓存失效"""
+        keys = self._dep_index.pop(entity_id, None)
+        if not keys:
+            return
+        for key in keys:
+            if key in self.entries:
+                self._remove(key)
+                self.invalidations += 1
+
+    def _remove(self, key: str):
+        """删除条目并清理依赖索引"""
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for entity_id in entry["deps"]:
+            keys = self._dep_index.get(entity_id)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._dep_index[entity_id]
+
+    def _fingerprint(self, deps):
+        """计算依赖实体的状态指纹"""
+        states = []
+        for entity_id in deps:
+            state = self.hass.states.get(entity_id)
+            states.append((entity_id, state.state if state else None))
+        return hash(tuple(states))
+
+    @staticmethod
+    def _key(command: str, scope) -> str:
+        return "|".join((normalize_command(command), *scope))
@@ -0,0 +1,107 @@
+"""DeepSeek AI 运行统计传感器"""
+import logging
+from datetime import timedelta
+
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, PERCENTAGE, UnitOfInformation, UnitOfTime
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+SCAN_INTERVAL = timedelta(seconds=30)
+
+# (键, 名称, 单位, 状态类别, 取值函数)
+STAT_SENSORS = [
+    ("response_cache_hits", "响应缓存命中", None, SensorStateClass.TOTAL_INCREASING,
+     lambda brain: brain.response_cache.hits),
+    ("response_cache_misses", "响应缓存未命中", None, SensorStateClass.TOTAL_INCREASING,
+     lambda brain: brain.response_cache.misses),
+    ("response_cache_evictions", "响应缓存淘汰", None, SensorStateClass.TOTAL_INCREASING,
+     lambda brain: brain.response_cache.evictions + brain.response_cache.invalidations),
+    ("response_cache_size", "响应缓存条目", None, SensorStateClass.MEASUREMENT,
+     lambda brain: len(brain.response_cache.entries)),
+    ("response_cache_hit_rate", "响应缓存命中率", PERCENTAGE, SensorStateClass.MEASUREMENT,
+     lambda brain: round(brain.response_cache.hit_rate * 100, 1)),
+    ("local_intent_hit_rate", "本地意图命中率", PERCENTAGE, SensorStateClass.MEASUREMENT,
+     lambda brain: round(brain.intent_matcher.hit_rate * 100, 1)),
+    ("command_queue_depth", "命令队列深度", None, SensorStateClass.MEASUREMENT,
+     lambda brain: brain.scheduler.queue_depth),
+    ("api_in_flight", "进行中的API请求", None, SensorStateClass.MEASUREMENT,
+     lambda brain: brain.scheduler.api_in_flight),
+    ("command_wait_time", "命令平均等待时间", UnitOfTime.MILLISECONDS, SensorStateClass.MEASUREMENT,
+     lambda brain: round(brain.scheduler.average_wait * 1000, 1)),
+    ("command_rejected", "被拒绝的命令", None, SensorStateClass.TOTAL_INCREASING,
+     lambda brain: brain.scheduler.rejected),
+    ("device_incremental_updates", "设备增量更新", None, SensorStateClass.TOTAL_INCREASING,
+     lambda brain: brain.device_manager.incremental_updates),
+    ("conversation_count", "对话记忆会话数", None, SensorStateClass.MEASUREMENT,
+     lambda brain: len(brain.conversation_memory.conversations)),
+    ("conversation_summaries", "对话摘要次数", None, SensorStateClass.TOTAL_INCREASING,
+     lambda brain: brain.conversation_memory.summaries),
+    ("occupancy_confidence", "全屋占用置信度", PERCENTAGE, SensorStateClass.MEASUREMENT,
+     lambda brain: round(brain.occupancy.house_confidence() * 100)),
+    ("tts_queue_depth", "语音播报队列深度", None, SensorStateClass.MEASUREMENT,
+     lambda brain: brain.speech_processor.dispatcher.queue_depth),
+    ("tts_dropped", "语音播报丢弃/合并", None, SensorStateClass.TOTAL_INCREASING,
+     lambda brain: brain.speech_processor.dispatcher.dropped + brain.speech_processor.dispatcher.coalesced),
+    ("tts_cache_hits", "语音合成缓存命中", None, SensorStateClass.TOTAL_INCREASING,
+     lambda brain: brain.speech_processor.backend.cache_hits),
+    ("api_connection_reuse_rate", "API连接复用率", PERCENTAGE, SensorStateClass.MEASUREMENT,
+     lambda brain: round(brain.client.reuse_ratio * 100, 1)),
+    ("api_connections_created", "API新建连接", None, SensorStateClass.TOTAL_INCREASING,
+     lambda brain: brain.client.connections_created),
+    ("api_chat_latency_p95", "对话API首字节延迟P95", UnitOfTime.MILLISECONDS, SensorStateClass.MEASUREMENT,
+     lambda brain: brain.client.metrics("chat").as_dict()["p95_ms"]),
+    ("api_chat_failures", "对话API失败", None, SensorStateClass.TOTAL_INCREASING,
+     lambda brain: brain.client.metrics("chat").failures),
+    ("api_chat_retries", "对话API重试", None, SensorStateClass.TOTAL_INCREASING,
+     lambda brain: brain.client.metrics("chat").retries),
+    ("api_chat_hedge_wins", "对话API对冲请求胜出", None, SensorStateClass.TOTAL_INCREASING,
+     lambda brain: brain.client.metrics("chat").hedge_wins),
+    ("api_chat_circuit", "对话API熔断状态", None, None,
+     lambda brain: brain.client.metrics("chat").breaker.state),
+    ("api_vision_latency_p95", "视觉API首字节延迟P95", UnitOfTime.MILLISECONDS, SensorStateClass.MEASUREMENT,
+     lambda brain: brain.client.metrics("vision").as_dict()["p95_ms"]),
+    ("api_vision_failures", "视觉API失败", None, SensorStateClass.TOTAL_INCREASING,
+     lambda brain: brain.client.metrics("vision").failures),
+    ("vision_frames_skipped", "视觉未变化帧跳过", None, SensorStateClass.TOTAL_INCREASING,
+     lambda brain: brain.vision_processor.frames_skipped),
+    ("vision_cache_hits", "视觉缓存命中", None, SensorStateClass.TOTAL_INCREASING,
+     lambda brain: brain.vision_processor.cache_hits),
+    ("vision_cache_invalidations", "视觉缓存移动失效", None, SensorStateClass.TOTAL_INCREASING,
+     lambda brain: brain.vision_processor.cache_invalidations),
+    ("vision_bytes_saved", "视觉上传节省字节", UnitOfInformation.BYTES, SensorStateClass.TOTAL_INCREASING,
+     lambda brain: brain.vision_processor.bytes_saved),
+]
+
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities):
+    """设置统计传感器"""
+    brain = hass.data[DOMAIN][entry.entry_id]["brain"]
+    async_add_entities(
+        DeepSeekStatSensor(entry, brain, *description)
+        for description in STAT_SENSORS
+    )
+
+
+class DeepSeekStatSensor(SensorEntity):
+    """读取智能中枢内部计数器的诊断传感器"""
+
+    _attr_should_poll = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, entry, brain, key, name, unit, state_class, value_fn):
+        self._brain = brain
+        self._value_fn = value_fn
+        self._attr_unique_id = f"{entry.entry_id}_{key}"
+        self._attr_name = f"DeepSeek {name}"
+        self._attr_native_unit_of_measurement = unit
+        self._attr_state_class = state_class
+
+    @property
+    def native_value(self):
+        """当前值"""
+        return self._value_fn(self._brain)
@@ -0,0 +1,75 @@
+"""分句器 - 在流式响应到达时按中英文句子边界切分，供逐句播报"""
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+# 中文句末标点（及换行）直接断句；英文句末标点需后接空白或引号才断句，避免切开小数和缩写
+CJK_TERMINATORS = "。！？；…\n"
+LATIN_TERMINATORS = ".!?;"
+CLOSERS = "”’\"'」』）)】"
+# 句子过长时在这些位置提前断开
+SOFT_BREAKS = "，、,：:"
+
+MIN_SENTENCE_CHARS = 4
+MAX_SENTENCE_CHARS = 80
+
+
+class SentenceSplitter:
+    """增量分句
+
+    feed 返回本次新完成的句子，未完成的部分留在缓冲区，flush 取出剩余文本。
+    过短的片段并入下一句，过长的句子在最后一个逗号处切开。
+    """
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS, max_chars: int = MAX_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+        self.received = 0
+
+    def feed(self, delta: str):
+        """输入一段文本，返回新完成的句子列表"""
+        self.received += len(delta)
+        buffer = self._buffer + delta
+        sentences = []
+        start = 0
+        soft_break = -1
+        index = 0
+        while index < len(buffer):
+            char = buffer[index]
+            end = None
+            if char in CJK_TERMINATORS:
+                end = index + 1
+            elif char in LATIN_TERMINATORS:
+                if index + 1 >= len(buffer):
+                    # 需要看到下一个字符才能判断是否断句
+                    break
+                following = buffer[index + 1]
+                if following.isspace() or following in CLOSERS:
+                    end = index + 1
+            elif char in SOFT_BREAKS:
+                soft_break = index + 1
+
+            if end is not None:
+                while end < len(buffer) and buffer[end] in CLOSERS:
+                    end += 1
+                if len(buffer[start:end].strip()) >= self.min_chars:
+                    sentences.append(buffer[start:end].strip())
+                    start = end
+                    soft_break = -1
+                index = end
+                continue
+
+            if index + 1 - start >= self.max_chars and soft_break > start:
+                sentences.append(buffer[start:soft_break].strip())
+                start = soft_break
+                soft_break = -1
+            index += 1
+
+        self._buffer = buffer[start:]
+        return [sentence for sentence in sentences if sentence]
+
+    def flush(self):
+        """取出缓冲区中剩余的文本"""
+        rest, self._buffer = self._buffer.strip(), ""
+        return rest
@@ -1,37 +1,69 @@
 """语音处理器 - 处理语音输入/输出"""
 import logging
-from homeassistant.core import HomeAssistant
-from .const import DOMAIN
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.start import async_at_started
+from .const import ROLE_MOUTH, TTS_PRIORITY_NORMAL, DEFAULT_TTS_BACKEND, CANNED_PHRASES
+from .tts_backends import create_backend
+from .tts_dispatcher import TTSDispatcher
 
 _LOGGER = logging.getLogger(__name__)
 
 class SpeechProcessor:
     """处理语音输入和输出"""
     
-    def __init__(self, hass: HomeAssistant):
+    def __init__(self, hass: HomeAssistant, device_manager,
+                 backend: str = DEFAULT_TTS_BACKEND, engine: str = None):
         self.hass = hass
+        self.device_manager = device_manager
+        self.backend = create_backend(hass, backend, engine)
+        self.dispatcher = TTSDispatcher(hass, self.backend.async_say)
+        self._unsub_started = None
+        self._prewarm_task = None
     
-    async def text_to_speech(self, text: str):
-        """文本转语音并通过指定设备播放"""
+    @callback
+    def async_setup(self):
+        """Home Assistant 启动完成（TTS 实体已加载）后在后台预合成固定话术"""
+        self._unsub_started = async_at_started(self.hass, self._start_prewarm)
+    
+    @callback
+    def _start_prewarm(self, _hass):
+        """开始预合成"""
+        self._unsub_started = None
+        self._prewarm_task = self.hass.async_create_task(
+            self.backend.async_prewarm(CANNED_PHRASES)
+        )
+    
+    @callback
+    def async_cleanup(self):
+        """停止播报队列和预合成"""
+        if self._unsub_started:
+            self._unsub_started()
+            self._unsub_started = None
+        if self._prewarm_task:
+            self._prewarm_task.cancel()
+            self._prewarm_task = None
+        self.dispatcher.async_cleanup()
+    
+    async def text_to_speech(self, text: str, area: str = None,
+                             priority: str = TTS_PRIORITY_NORMAL):
+        """文本转语音并通过指定设备播放（可指定区域），加入播报队列后立即返回"""
+        return self.async_enqueue(text, area, priority)
+    
+    @callback
+    def async_enqueue(self, text: str, area: str = None,
+                      priority: str = TTS_PRIORITY_NORMAL, utterance=None) -> bool:
+        """将文本加入区域主音箱的播报队列（可在事件循环回调中直接调用）
+
+        utterance 标识同一段回答的多句，这些句子会按顺序完整播放。
+        """
         # 查找语音输出设备
-        if DOMAIN in self.hass.data:
-            device_manager = self.hass.data[DOMAIN].get("device_manager")
-            if device_manager:
-                device = device_manager.get_primary_device("mouth")
-                if device and device["entities"]:
-                    entity_id = device["entities"][0]
-                    
-                    # 调用TTS服务
-                    await self.hass.services.async_call(
-                        "tts", 
-                        "xiaomi_miot_say", 
-                        {
-                            "entity_id": entity_id,
-                            "message": text
-                        },
-                        blocking=True
-                    )
-                    return True
+        device = self.device_manager.get_primary_device(ROLE_MOUTH, area)
+        if device and device["entities"]:
+            entity_id = next(
+                (e for e in device["entities"] if e.startswith("media_player.")),
+                device["entities"][0]
+            )
+            return self.dispatcher.enqueue(entity_id, text, priority, utterance)
         
         _LOGGER.warning("未找到语音输出设备")
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,156 @@
+"""流式JSON解析器 - 在响应生成过程中提前提取字段"""
+import json
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+# 事件类型
+EVENT_VALUE = "value"
+EVENT_TEXT = "text"
+
+
+class StreamingJSONParser:
+    """增量解析模型输出的JSON对象
+
+    只跟踪顶层对象的字段：
+    - watch_keys 中的字段一旦完整即产生 ("value", key, obj) 事件
+    - stream_key 对应的字符串值逐段产生 ("text", key, delta) 事件
+    """
+
+    def __init__(self, watch_keys=("action",), stream_key="response"):
+        self.watch_keys = set(watch_keys)
+        self.stream_key = stream_key
+        self._chars = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._expect_key = False
+        self._current_key = None
+        self._value_start = None
+        self._streaming = False
+        self._esc_buf = ""
+        self._high_surrogate = ""
+        self.completed = {}
+        self.done = False
+
+    def feed(self, chunk: str):
+        """输入一段文本，返回新产生的事件列表"""
+        events = []
+        for ch in chunk:
+            pos = len(self._chars)
+            self._chars.append(ch)
+
+            if self._in_string:
+                if self._streaming:
+                    delta = self._decode_stream_char(ch)
+                    if delta:
+                        if events and events[-1][0] == EVENT_TEXT:
+                            delta = events.pop()[2] + delta
+                        events.append((EVENT_TEXT, self.stream_key, delta))
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._end_string(pos, events)
+                continue
+
+            if self.done:
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = pos
+                if self._depth == 1 and not self._expect_key and self._value_start is None:
+                    self._value_start = pos
+                    self._streaming = self._current_key == self.stream_key
+            elif ch in "{[":
+                if self._depth == 1 and not self._expect_key and self._value_start is None:
+                    self._value_start = pos
+                self._depth += 1
+                if self._depth == 1 and ch == "{":
+                    self._expect_key = True
+            elif ch in "}]":
+                if self._depth == 1:
+                    # 顶层对象结束前可能还有未提交的基本类型值
+                    self._commit_value(pos, events)
+                self._depth -= 1
+                if self._depth == 1 and self._value_start is not None:
+                    self._commit_value(pos + 1, events)
+                elif self._depth == 0:
+                    self.done = True
+            elif self._depth == 1:
+                if ch == ",":
+                    self._commit_value(pos, events)
+                    self._expect_key = True
+                elif ch == ":" or ch.isspace():
+                    pass
+                elif not self._expect_key and self._value_start is None:
+                    # 数字、true/false/null 等基本类型
+                    self._value_start = pos
+        return events
+
+    def result(self):
+        """返回完整解析结果"""
+        return json.loads("".join(self._chars))
+
+    def _end_string(self, pos, events):
+        """字符串结束时处理键名或值"""
+        if self._depth != 1:
+            return
+        if self._expect_key:
+            self._current_key = json.loads("".join(self._chars[self._string_start:pos + 1]))
+            self._expect_key = False
+        elif self._value_start == self._string_start:
+            self._streaming = False
+            self._commit_value(pos + 1, events)
+
+    def _commit_value(self, end, events):
+        """提交顶层字段的值"""
+        if self._value_start is None:
+            return
+        raw = "".join(self._chars[self._value_start:end]).strip()
+        self._value_start = None
+        key = self._current_key
+        self._current_key = None
+        if key not in self.watch_keys or key in self.completed:
+            return
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            _LOGGER.debug(f"流式字段解析失败: {key}={raw}")
+            return
+        self.completed[key] = value
+        events.append((EVENT_VALUE, key, value))
+
+    def _decode_stream_char(self, ch):
+        """解码流式字符串中的字符（含转义序列）"""
+        if self._esc_buf:
+            self._esc_buf += ch
+            if self._esc_buf[1] == "u" and len(self._esc_buf) < 6:
+                return ""
+            raw, self._esc_buf = self._esc_buf, ""
+            try:
+                text = json.loads(f'"{raw}"')
+            except ValueError:
+                return ""
+            # 处理UTF-16代理对
+            if len(text) == 1 and 0xD800 <= ord(text) <= 0xDBFF:
+                self._high_surrogate = text
+                return ""
+            if self._high_surrogate:
+                text = (self._high_surrogate + text).encode(
+                    "utf-16", "surrogatepass"
+                ).decode("utf-16")
+                self._high_surrogate = ""
+            return text
+        if self._escape:
+            return ""
+        if ch == "\\":
+            self._esc_buf = ch
+            return ""
+        if ch == '"':
+            return ""
+        return ch
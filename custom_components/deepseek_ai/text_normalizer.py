@@ -0,0 +1,70 @@
+"""命令文本归一化与分词"""
+import re
+import unicodedata
+
+# 同义词替换（长词优先）
+SYNONYMS = {
+    "打开一下": "打开",
+    "开一下": "打开",
+    "开启": "打开",
+    "启动": "打开",
+    "关一下": "关闭",
+    "关掉": "关闭",
+    "关上": "关闭",
+    "停止": "关闭",
+    "灯光": "灯",
+    "电灯": "灯",
+    "台灯": "灯",
+    "空调机": "空调",
+    "调高": "升高",
+    "调低": "降低"
+}
+
+# 无实际语义的语气词和客套词
+FILLER_WORDS = [
+    "麻烦你", "麻烦", "帮我", "给我", "请你", "请", "一下", "可以", "能不能",
+    "吧", "啊", "呀", "呢", "了", "的", "哦", "嘛", "哈"
+]
+
+# 决定命令语义的动词字符（开/关、升/降等相反动作不能互相近似）
+VERB_CHARS = "开关调升降设停播暂"
+
+_NUMBER_RE = re.compile(r"[0-9]+(?:\.[0-9]+)?|[零一二两三四五六七八九十百半]+")
+
+_SYNONYM_RE = re.compile("|".join(
+    re.escape(word) for word in sorted(SYNONYMS, key=len, reverse=True)
+))
+_FILLER_RE = re.compile("|".join(
+    re.escape(word) for word in sorted(FILLER_WORDS, key=len, reverse=True)
+))
+
+
+def normalize_command(command: str) -> str:
+    """归一化命令：去除标点、空白和语气词，统一同义词"""
+    text = unicodedata.normalize("NFKC", command).lower()
+    text = "".join(
+        ch for ch in text
+        if not unicodedata.category(ch).startswith(("P", "Z", "S")) and not ch.isspace()
+    )
+    text = _SYNONYM_RE.sub(lambda m: SYNONYMS[m.group(0)], text)
+    return _FILLER_RE.sub("", text)
+
+
+def command_signature(normalized: str) -> tuple:
+    """提取命令中的动词与数字，二者不同的命令不可近似匹配"""
+    verbs = frozenset(ch for ch in normalized if ch in VERB_CHARS)
+    return verbs, tuple(_NUMBER_RE.findall(normalized))
+
+
+def tokenize(normalized: str) -> set:
+    """将归一化后的文本切分为字符二元组集合"""
+    if len(normalized) < 2:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + 2] for i in range(len(normalized) - 1)}
+
+
+def similarity(tokens_a: set, tokens_b: set) -> float:
+    """词集合的Jaccard相似度"""
+    if not tokens_a or not tokens_b:
+        return 0.0
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
@@ -0,0 +1,239 @@
+"""语音合成后端 - 小米音箱、通用 tts.speak、media_player.play_media（缓存合成音频）"""
+import asyncio
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from homeassistant.components import media_source
+from homeassistant.components.tts import generate_media_source_id
+from homeassistant.core import HomeAssistant
+
+from .const import TTS_BACKEND_XIAOMI, TTS_BACKEND_TTS_SPEAK, TTS_BACKEND_MEDIA_PLAYER
+
+_LOGGER = logging.getLogger(__name__)
+
+# 非固定话术的合成结果最多缓存条数
+PHRASE_CACHE_SIZE = 200
+
+# 预合成失败（如 TTS 引擎尚未就绪）时的重试次数与间隔（秒）
+PREWARM_ATTEMPTS = 3
+PREWARM_RETRY_DELAY = 60
+
+
+class PhraseCache:
+    """按内容寻址的合成音频缓存 {hash(引擎, 文本): 音频URL}
+
+    固定话术预热后常驻，其余文本按LRU淘汰。
+    """
+
+    def __init__(self, max_size: int = PHRASE_CACHE_SIZE):
+        self.max_size = max_size
+        self._pinned = {}
+        self._recent = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._pinned) + len(self._recent)
+
+    @staticmethod
+    def key(engine, text: str) -> str:
+        """内容地址"""
+        return hashlib.sha1(f"{engine or ''}\n{text}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """查找缓存的URL"""
+        url = self._pinned.get(key)
+        if url is None:
+            url = self._recent.get(key)
+            if url is not None:
+                self._recent.move_to_end(key)
+        if url is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return url
+
+    def put(self, key: str, url: str, pinned: bool = False):
+        """写入缓存"""
+        if pinned:
+            self._pinned[key] = url
+            self._recent.pop(key, None)
+            return
+        if key in self._pinned:
+            return
+        self._recent[key] = url
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.max_size:
+            self._recent.popitem(last=False)
+
+    def discard(self, key: str):
+        """删除失效的URL"""
+        self._pinned.pop(key, None)
+        self._recent.pop(key, None)
+
+
+class TTSBackend(ABC):
+    """语音合成后端基类"""
+
+    name = None
+
+    def __init__(self, hass: HomeAssistant, engine: str = None):
+        self.hass = hass
+        self.engine = engine or None
+        # 本地合成音频缓存（仅直接播放音频URL的后端使用）
+        self.cache = None
+
+    @property
+    def cache_hits(self):
+        """本地缓存命中次数"""
+        return self.cache.hits if self.cache else 0
+
+    @abstractmethod
+    async def async_say(self, entity_id: str, text: str):
+        """在音箱上播放文本"""
+
+    async def async_prewarm(self, phrases):
+        """预先合成固定话术（不支持预合成的后端忽略）"""
+
+
+class XiaomiBackend(TTSBackend):
+    """小米音箱自带合成（xiaomi_miot），在音箱端合成，无法预热"""
+
+    name = TTS_BACKEND_XIAOMI
+
+    async def async_say(self, entity_id: str, text: str):
+        await self.hass.services.async_call(
+            "tts",
+            "xiaomi_miot_say",
+            {
+                "entity_id": entity_id,
+                "message": text
+            },
+            blocking=True
+        )
+
+
+class _SynthesizingBackend(TTSBackend):
+    """由 Home Assistant TTS 引擎合成的后端，合成结果写入 Home Assistant 的 TTS 缓存"""
+
+    async def async_prewarm(self, phrases):
+        """预合成固定话术，失败的话术稍后重试"""
+        pending = list(phrases)
+        for attempt in range(PREWARM_ATTEMPTS):
+            if attempt:
+                await asyncio.sleep(PREWARM_RETRY_DELAY)
+            failed = []
+            error = None
+            for phrase in pending:
+                try:
+                    await self._async_prewarm_phrase(phrase)
+                except Exception as e:
+                    failed.append(phrase)
+                    error = e
+            if not failed:
+                _LOGGER.info(f"已预合成 {len(phrases)} 条固定话术")
+                return
+            _LOGGER.debug(f"{len(failed)} 条话术预合成失败({error!r})，稍后重试")
+            pending = failed
+        _LOGGER.warning(
+            f"{len(pending)}/{len(phrases)} 条固定话术预合成失败，将在首次播报时合成: {error!r}"
+        )
+
+    async def _async_prewarm_phrase(self, text: str):
+        """预合成一条话术"""
+        await self._async_synthesize(text)
+
+    async def _async_synthesize(self, text: str) -> str:
+        """通过 TTS 引擎合成文本，返回可播放的音频URL"""
+        media_id = generate_media_source_id(self.hass, text, engine=self.engine, cache=True)
+        resolved = await media_source.async_resolve_media(self.hass, media_id, None)
+        return media_source.async_process_play_media_url(self.hass, resolved.url)
+
+
+class TTSSpeakBackend(_SynthesizingBackend):
+    """通用 tts.speak（需指定 tts 实体）
+
+    tts.speak 按文本查找 Home Assistant 的 TTS 缓存，预合成即可命中，无需本地缓存。
+    """
+
+    name = TTS_BACKEND_TTS_SPEAK
+
+    async def async_say(self, entity_id: str, text: str):
+        await self.hass.services.async_call(
+            "tts",
+            "speak",
+            {
+                "entity_id": self.engine,
+                "media_player_entity_id": entity_id,
+                "message": text,
+                "cache": True
+            },
+            blocking=True
+        )
+
+
+class MediaPlayerBackend(_SynthesizingBackend):
+    """合成后通过 media_player.play_media 播放缓存的音频URL"""
+
+    name = TTS_BACKEND_MEDIA_PLAYER
+
+    def __init__(self, hass: HomeAssistant, engine: str = None):
+        super().__init__(hass, engine)
+        self.cache = PhraseCache()
+
+    async def _async_prewarm_phrase(self, text: str):
+        await self._async_resolve(text, pinned=True)
+
+    async def _async_resolve(self, text: str, pinned: bool = False) -> str:
+        """获取文本的音频URL（命中缓存时无需合成）"""
+        key = self.cache.key(self.engine, text)
+        url = self.cache.get(key)
+        if url is not None:
+            if pinned:
+                self.cache.put(key, url, pinned=True)
+            return url
+        url = await self._async_synthesize(text)
+        self.cache.put(key, url, pinned=pinned)
+        return url
+
+    async def async_say(self, entity_id: str, text: str):
+        url = await self._async_resolve(text)
+        try:
+            await self._async_play(entity_id, url)
+        except Exception:
+            # 缓存的URL可能已失效，重新合成一次
+            self.cache.discard(self.cache.key(self.engine, text))
+            await self._async_play(entity_id, await self._async_resolve(text))
+
+    async def _async_play(self, entity_id: str, url: str):
+        """播放音频URL"""
+        await self.hass.services.async_call(
+            "media_player",
+            "play_media",
+            {
+                "entity_id": entity_id,
+                "media_content_id": url,
+                "media_content_type": "music"
+            },
+            blocking=True
+        )
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (XiaomiBackend, TTSSpeakBackend, MediaPlayerBackend)
+}
+
+
+def create_backend(hass: HomeAssistant, name: str, engine: str = None) -> TTSBackend:
+    """按名称创建后端"""
+    if name == TTS_BACKEND_TTS_SPEAK and not engine:
+        _LOGGER.warning("tts.speak 后端需要指定 TTS 实体，改用小米音箱合成")
+        name = TTS_BACKEND_XIAOMI
+    backend = BACKENDS.get(name)
+    if backend is None:
+        _LOGGER.warning(f"未知的语音后端 {name}，改用小米音箱合成")
+        backend = XiaomiBackend
+    return backend(hass, engine)
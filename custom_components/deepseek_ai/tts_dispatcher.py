@@ -0,0 +1,171 @@
+"""语音播报调度 - 每个音箱一个队列，按优先级播报，合并重复消息并丢弃过期消息"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import TTS_PRIORITY_URGENT, TTS_PRIORITY_NORMAL, TTS_PRIORITY_LOW
+
+_LOGGER = logging.getLogger(__name__)
+
+# 优先级车道（靠前的先播）及各车道消息的最长排队时间（秒）
+PRIORITY_LANES = (TTS_PRIORITY_URGENT, TTS_PRIORITY_NORMAL, TTS_PRIORITY_LOW)
+MAX_QUEUE_AGE = {
+    TTS_PRIORITY_URGENT: 300,
+    TTS_PRIORITY_NORMAL: 60,
+    TTS_PRIORITY_LOW: 20
+}
+MAX_LANE_LENGTH = 10
+
+# 估算播放时长，避免下一条消息覆盖正在播放的语音
+CHARS_PER_SECOND = 4.0
+MAX_PLAYBACK_WAIT = 30
+
+
+class _Message:
+    """排队中的消息"""
+
+    __slots__ = ("text", "lane", "utterance", "created")
+
+    def __init__(self, text: str, lane: int, utterance=None):
+        self.text = text
+        self.lane = lane
+        self.utterance = utterance
+        self.created = time.monotonic()
+
+
+class _SpeakerQueue:
+    """单个音箱的优先级车道与播放任务"""
+
+    __slots__ = ("lanes", "task", "interrupt", "last_utterance", "last_finished")
+
+    def __init__(self):
+        self.lanes = [deque() for _ in PRIORITY_LANES]
+        self.task = None
+        self.interrupt = asyncio.Event()
+        # 最近播完的消息所属的语句及播完时间
+        self.last_utterance = None
+        self.last_finished = 0.0
+
+    def __len__(self):
+        return sum(len(lane) for lane in self.lanes)
+
+
+class TTSDispatcher:
+    """语音播报调度器
+
+    - enqueue 立即返回，每个音箱由独立任务顺序播放，不同音箱并行
+    - 紧急消息插到最前，并打断当前消息的播放等待
+    - 已排队的相同文本只保留一条（必要时提升优先级），超时未播的消息直接丢弃
+    - 同一语句（utterance）的多句按顺序完整播放：不合并、不因车道已满被挤掉，
+      排队时长从上一句播完时算起
+    """
+
+    def __init__(self, hass: HomeAssistant, play):
+        self.hass = hass
+        self._play = play
+        self._queues = {}
+        self.played = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    @property
+    def queue_depth(self):
+        """所有音箱排队中的消息数"""
+        return sum(len(queue) for queue in self._queues.values())
+
+    @callback
+    def enqueue(self, entity_id: str, text: str, priority: str = TTS_PRIORITY_NORMAL,
+                utterance=None) -> bool:
+        """将消息加入指定音箱的队列，utterance 标识属于同一段回答的多句"""
+        if not text:
+            return False
+        lane_index = PRIORITY_LANES.index(priority) if priority in PRIORITY_LANES else 1
+        queue = self._queues.get(entity_id)
+        if queue is None:
+            queue = self._queues[entity_id] = _SpeakerQueue()
+
+        # 合并重复消息（同一语句中的重复句子照常播放）
+        for lane in queue.lanes if utterance is None else ():
+            for message in lane:
+                if message.text == text and message.utterance is None:
+                    if lane_index < message.lane:
+                        lane.remove(message)
+                        message.lane = lane_index
+                        queue.lanes[lane_index].append(message)
+                    self.coalesced += 1
+                    self._ensure_running(entity_id, queue, lane_index)
+                    return True
+
+        lane = queue.lanes[lane_index]
+        if len(lane) >= MAX_LANE_LENGTH:
+            # 挤掉最早的独立消息
+            oldest = next((message for message in lane if message.utterance is None), None)
+            if oldest is not None:
+                lane.remove(oldest)
+                self.dropped += 1
+        lane.append(_Message(text, lane_index, utterance))
+        self._ensure_running(entity_id, queue, lane_index)
+        return True
+
+    @callback
+    def async_cleanup(self):
+        """停止所有播放任务"""
+        for queue in self._queues.values():
+            if queue.task:
+                queue.task.cancel()
+        self._queues.clear()
+
+    @callback
+    def _ensure_running(self, entity_id, queue, lane_index):
+        """启动音箱的播放任务；紧急消息打断播放等待"""
+        if lane_index == 0:
+            queue.interrupt.set()
+        if queue.task is None:
+            queue.task = self.hass.async_create_task(self._async_run(entity_id, queue))
+
+    def _next(self, queue):
+        """取出优先级最高且未过期的消息"""
+        now = time.monotonic()
+        for lane_index, lane in enumerate(queue.lanes):
+            while lane:
+                message = lane.popleft()
+                created = message.created
+                if message.utterance is not None and message.utterance == queue.last_utterance:
+                    created = max(created, queue.last_finished)
+                if now - created <= MAX_QUEUE_AGE[PRIORITY_LANES[lane_index]]:
+                    return message
+                self.dropped += 1
+                _LOGGER.debug(f"丢弃过期播报: {message.text}")
+        return None
+
+    async def _async_run(self, entity_id, queue):
+        """顺序播放音箱队列中的消息，队列为空时退出"""
+        try:
+            while True:
+                message = self._next(queue)
+                if message is None:
+                    return
+                queue.interrupt.clear()
+                try:
+                    await self._play(entity_id, message.text)
+                    self.played += 1
+                except Exception as e:
+                    _LOGGER.error(f"语音播报失败 {entity_id}: {e}")
+                    continue
+
+                # 等待预计播放时长，期间有紧急消息则立即切换
+                if not queue.lanes[0]:
+                    duration = min(len(message.text) / CHARS_PER_SECOND, MAX_PLAYBACK_WAIT)
+                    try:
+                        await asyncio.wait_for(queue.interrupt.wait(), duration)
+                    except asyncio.TimeoutError:
+                        pass
+                queue.last_utterance = message.utterance
+                queue.last_finished = time.monotonic()
+        finally:
+            queue.task = None
+            if not len(queue) and self._queues.get(entity_id) is queue:
+                del self._queues[entity_id]
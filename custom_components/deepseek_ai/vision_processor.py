@@ -1,84 +1,290 @@
 """视觉处理器 - 处理摄像头输入"""
+import asyncio
 import logging
+import time
 import base64
-import aiohttp
-import os
-from homeassistant.core import HomeAssistant
-from .const import DOMAIN, DEFAULT_API_BASE
+import json
+from homeassistant.components.camera import async_get_image
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from .api_client import async_get_client
+from .const import (
+    DOMAIN,
+    ROLE_EYES,
+    DEFAULT_API_BASE,
+    DEFAULT_VISION_MAX_EDGE,
+    DEFAULT_VISION_QUALITY,
+    DEFAULT_VISION_CHANGE_THRESHOLD,
+    DEFAULT_VISION_CACHE_TTL,
+    MOTION_DEVICE_CLASSES
+)
+from .image_preprocessor import frame_hash, preprocess_image, hamming_distance
 
 _LOGGER = logging.getLogger(__name__)
 
+SNAPSHOT_TIMEOUT = 10
+MAX_CONCURRENT_CAMERAS = 4
+DEFAULT_VISION_PROMPT = "描述图像中的场景"
+
+
+def _build_vision_body(image: bytes, content_type: str, prompt: str) -> bytes:
+    """base64编码图像并序列化请求体（在执行器线程中运行）"""
+    image_data = base64.b64encode(image).decode("ascii")
+    payload = {
+        "model": "deepseek-vision",
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": f"data:{content_type};base64,{image_data}"}
+                ]
+            }
+        ],
+        "max_tokens": 300
+    }
+    return json.dumps(payload).encode("utf-8")
+
 class VisionProcessor:
     """处理视觉输入和图像分析"""
     
-    def __init__(self, hass: HomeAssistant, api_key: str):
+    def __init__(self, hass: HomeAssistant, api_key: str,
+                 max_edge: int = DEFAULT_VISION_MAX_EDGE,
+                 quality: int = DEFAULT_VISION_QUALITY,
+                 change_threshold: int = DEFAULT_VISION_CHANGE_THRESHOLD,
+                 cache_ttl: int = DEFAULT_VISION_CACHE_TTL,
+                 device_manager=None):
         self.hass = hass
         self.api_key = api_key
-        self.session = aiohttp.ClientSession()
+        self.client = async_get_client(hass)
+        self.max_edge = max_edge
+        self.quality = quality
+        self.change_threshold = change_threshold
+        # 每个摄像头最近一帧的感知哈希及其描述 {entity_id: {"hash", "descriptions"}}
+        self._last_frames = {}
+        self.frames_skipped = 0
+        self.bytes_saved = 0
+        self._camera_semaphore = asyncio.Semaphore(MAX_CONCURRENT_CAMERAS)
+        # 描述结果缓存 {entity_id: {prompt: (描述, 时间)}}，移动传感器变化时提前失效
+        self.cache_ttl = cache_ttl
+        self.device_manager = device_manager
+        self._results = {}
+        self._motion_cameras = {}
+        # 摄像头/移动传感器 -> 分组键（同设备、同区域），分组键 -> 摄像头/移动传感器
+        self._cameras = {}
+        self._motions = {}
+        self._cameras_by_key = {}
+        self._motions_by_key = {}
+        self._unsub_devices = None
+        self.cache_hits = 0
+        self.cache_invalidations = 0
     
-    async def analyze_image(self, entity_id: str):
-        """分析指定摄像头的图像"""
-        # 获取摄像头快照
-        snapshot_path = "/tmp/deepseek_snapshot.jpg"
-        await self.hass.services.async_call(
-            "camera", 
-            "snapshot", 
-            {"entity_id": entity_id, "filename": snapshot_path},
-            blocking=True
-        )
+    async def async_setup(self):
+        """建立移动传感器与摄像头的对应关系"""
+        if self.device_manager is not None:
+            self.rebuild_motion_index()
+            self._unsub_devices = self.device_manager.async_add_listener(
+                self.rebuild_motion_index
+            )
+    
+    async def async_cleanup(self):
+        """取消订阅"""
+        if self._unsub_devices:
+            self._unsub_devices()
+            self._unsub_devices = None
+    
+    @callback
+    def rebuild_motion_index(self, changes=None):
+        """按同设备或同区域将移动传感器映射到摄像头，增量变化时只重算受影响的传感器"""
+        entity_index = self.device_manager.entity_index
+        if changes is None:
+            self._cameras = {}
+            self._motions = {}
+            self._cameras_by_key = {}
+            self._motions_by_key = {}
+            self._motion_cameras = {}
+        entity_ids = entity_index if changes is None else changes["entities"]
         
-        # 检查文件是否存在
-        if not os.path.exists(snapshot_path):
-            return "无法获取图像"
+        touched = set()
+        for entity_id in entity_ids:
+            touched |= self._unindex_motion_entity(entity_id)
+            touched |= self._index_motion_entity(entity_id, entity_index.get(entity_id))
         
-        # 读取图像数据
+        sensors = self._motions if changes is None else {
+            sensor for key in touched for sensor in self._motions_by_key.get(key, ())
+        }
+        for sensor in sensors:
+            cameras = set().union(
+                *(self._cameras_by_key.get(key, ()) for key in self._motions[sensor])
+            )
+            if cameras:
+                self._motion_cameras[sensor] = frozenset(cameras)
+            else:
+                self._motion_cameras.pop(sensor, None)
+        
+        for entity_id in list(self._results) if changes is None else entity_ids:
+            if entity_id not in entity_index:
+                self._results.pop(entity_id, None)
+    
+    def _index_motion_entity(self, entity_id, info):
+        """加入摄像头或移动传感器，返回其分组键"""
+        if info is None:
+            return set()
+        keys = (("device", info["device_id"]),)
+        if info["area"]:
+            keys += (("area", info["area"]),)
+        if entity_id.startswith("camera."):
+            device = self.device_manager.get_device(info["device_id"])
+            if not device or ROLE_EYES not in device["roles"]:
+                return set()
+            self._cameras[entity_id] = keys
+            for key in keys:
+                self._cameras_by_key.setdefault(key, set()).add(entity_id)
+            return set(keys)
+        if info["domain"] != "binary_sensor":
+            return set()
+        if info.get("device_class") not in MOTION_DEVICE_CLASSES and "motion" not in entity_id:
+            return set()
+        self._motions[entity_id] = keys
+        for key in keys:
+            self._motions_by_key.setdefault(key, set()).add(entity_id)
+        return set(keys)
+    
+    def _unindex_motion_entity(self, entity_id):
+        """移除摄像头或移动传感器，返回其原分组键"""
+        for entities, by_key in (
+            (self._cameras, self._cameras_by_key),
+            (self._motions, self._motions_by_key)
+        ):
+            keys = entities.pop(entity_id, None)
+            if keys is None:
+                continue
+            for key in keys:
+                members = by_key[key]
+                members.discard(entity_id)
+                if not members:
+                    del by_key[key]
+            self._motion_cameras.pop(entity_id, None)
+            return set(keys)
+        return set()
+    
+    @callback
+    def invalidate_entity(self, entity_id, *_):
+        """移动传感器状态变化时丢弃相关摄像头的缓存描述"""
+        for camera in self._motion_cameras.get(entity_id, ()):
+            if self._results.pop(camera, None) is not None:
+                self.cache_invalidations += 1
+                _LOGGER.debug(f"{entity_id} 检测到变化，{camera} 视觉缓存失效")
+    
+    def get_cached_result(self, entity_id: str, prompt: str = DEFAULT_VISION_PROMPT):
+        """获取未过期的缓存描述，返回 (描述, 缓存时长秒) 或 None"""
+        cached = self._results.get(entity_id, {}).get(prompt)
+        if cached is None:
+            return None
+        age = time.monotonic() - cached[1]
+        if age > self.cache_ttl:
+            del self._results[entity_id][prompt]
+            return None
+        return cached[0], age
+    
+    async def analyze_image(self, entity_id: str, prompt: str = DEFAULT_VISION_PROMPT):
+        """分析指定摄像头的图像"""
+        description, _ = await self.analyze_image_with_age(entity_id, prompt)
+        return description
+    
+    async def analyze_image_with_age(self, entity_id: str, prompt: str = DEFAULT_VISION_PROMPT):
+        """分析指定摄像头的图像，返回 (描述, 结果时长秒)，缓存命中时不再抓拍"""
+        cached = self.get_cached_result(entity_id, prompt)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        
+        # 直接在内存中获取摄像头画面，不经过临时文件
         try:
-            with open(snapshot_path, "rb") as image_file:
-                image_data = base64.b64encode(image_file.read()).decode("utf-8")
-        except Exception as e:
-            return f"读取图像失败: {str(e)}"
+            image = await async_get_image(self.hass, entity_id, timeout=SNAPSHOT_TIMEOUT)
+        except HomeAssistantError as e:
+            _LOGGER.warning(f"获取摄像头画面失败 {entity_id}: {e}")
+            return "无法获取图像", 0.0
         
-        # 调用视觉API
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        # 先从缩略画面计算感知哈希，画面基本未变化时复用上一次的描述
+        current_hash = await self.hass.async_add_executor_job(frame_hash, image.content)
+        last = self._last_frames.get(entity_id)
+        if current_hash is not None and last is not None:
+            if hamming_distance(current_hash, last["hash"]) <= self.change_threshold:
+                if prompt in last["descriptions"]:
+                    self.frames_skipped += 1
+                    _LOGGER.debug(f"{entity_id} 画面未变化，复用上次描述")
+                    description, analyzed_at = last["descriptions"][prompt]
+                    self._store_result(entity_id, prompt, description, analyzed_at)
+                    return description, time.monotonic() - analyzed_at
+            else:
+                last = None
+        
+        # 需要重新分析时才缩放和重新压缩
+        content, content_type = await self.hass.async_add_executor_job(
+            preprocess_image,
+            image.content,
+            image.content_type or "image/jpeg",
+            self.max_edge,
+            self.quality
+        )
+        self.bytes_saved += max(0, len(image.content) - len(content))
+        
+        description, success = await self._describe(content, content_type, prompt)
+        if success:
+            analyzed_at = time.monotonic()
+            if current_hash is not None:
+                if last is None:
+                    last = self._last_frames[entity_id] = {"hash": current_hash, "descriptions": {}}
+                last["descriptions"][prompt] = (description, analyzed_at)
+            self._store_result(entity_id, prompt, description, analyzed_at)
+        return description, 0.0
+    
+    def _store_result(self, entity_id: str, prompt: str, description: str, analyzed_at: float):
+        """缓存描述结果（analyzed_at 为实际分析的时间）"""
+        if self.cache_ttl > 0:
+            self._results.setdefault(entity_id, {})[prompt] = (description, analyzed_at)
+    
+    async def analyze_cameras(self, entity_ids, prompt: str = DEFAULT_VISION_PROMPT):
+        """并发分析多个摄像头（并发数受限），返回 {entity_id: 描述}"""
+        async def analyze(entity_id):
+            async with self._camera_semaphore:
+                return await self.analyze_image(entity_id, prompt)
         
-        payload = {
-            "model": "deepseek-vision",
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": "描述图像中的场景"},
-                        {"type": "image_url", "image_url": f"data:image/jpeg;base64,{image_data}"}
-                    ]
-                }
-            ],
-            "max_tokens": 300
+        entity_ids = list(dict.fromkeys(entity_ids))
+        results = await asyncio.gather(
+            *(analyze(entity_id) for entity_id in entity_ids),
+            return_exceptions=True
+        )
+        return {
+            entity_id: f"视觉处理错误: {result}" if isinstance(result, Exception) else result
+            for entity_id, result in zip(entity_ids, results)
         }
+    
+    async def _describe(self, image: bytes, content_type: str, prompt: str):
+        """调用视觉API描述图像，返回 (描述, 是否成功)"""
+        # 编码和序列化是CPU密集操作，放到执行器中避免阻塞事件循环
+        try:
+            body = await self.hass.async_add_executor_job(
+                _build_vision_body, image, content_type, prompt
+            )
+        except Exception as e:
+            return f"读取图像失败: {str(e)}", False
         
         try:
-            async with self.session.post(
+            response = await self.client.async_open(
+                "vision",
+                "POST",
                 f"{DEFAULT_API_BASE}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=30
-            ) as response:
+                self.api_key,
+                first_byte_timeout=30,
+                data=body
+            )
+            async with response:
                 if response.status != 200:
-                    return f"视觉API错误: {response.status}"
+                    return f"视觉API错误: {response.status}", False
                 
                 data = await response.json()
-                return data["choices"][0]["message"]["content"]
+                return data["choices"][0]["message"]["content"], True
         except Exception as e:
-            return f"视觉处理错误: {str(e)}"
-        finally:
-            # 清理临时文件
-            try:
-                os.remove(snapshot_path)
-            except:
-                pass
-    
-    async def close(self):
-        """关闭资源"""
-        await self.session.close()
\ No newline at end of file
+            return f"视觉处理错误: {str(e)}", False
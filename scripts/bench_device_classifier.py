@@ -0,0 +1,109 @@
+"""DeviceClassifier 批量分类基准测试
+
+在合成的设备/实体注册表上测量规则表编译与批量分类耗时，无需 Home Assistant:
+
+    python scripts/bench_device_classifier.py --devices 5000 --repeat 5
+"""
+import argparse
+import importlib.util
+import random
+import statistics
+import sys
+import time
+import types
+from collections import Counter
+from pathlib import Path
+
+PACKAGE_DIR = Path(__file__).resolve().parent.parent / "custom_components" / "deepseek_ai"
+PACKAGE = "deepseek_ai_bench"
+
+# (领域, 设备类别候选, 特性位候选)
+ENTITY_KINDS = [
+    ("camera", (None,), (0,)),
+    ("binary_sensor", ("motion", "occupancy", "sound", "door", "window", None), (0,)),
+    ("media_player", (None, "speaker", "tv"), (0, 512, 152463)),
+    ("light", (None,), (0, 32)),
+    ("switch", (None, "outlet", "switch"), (0,)),
+    ("cover", ("curtain", "blind", None), (0, 15)),
+    ("climate", (None,), (0, 385)),
+    ("fan", (None,), (0, 1)),
+    ("sensor", ("temperature", "humidity", "battery", "power", None), (0,)),
+    ("lock", (None,), (0,)),
+    ("vacuum", (None,), (0,)),
+    ("button", (None, "restart"), (0,)),
+]
+MANUFACTURERS = ["Xiaomi", "Mijia", "Aqara", "Yeelight", "Philips", "Sonoff", "Tuya", None]
+MODELS = ["camera.c300", "speaker.lx06", "gateway.v3", "light.bulb", "plug.v1", "sensor.ht", None]
+
+
+def _load_module(name):
+    """按路径加载集成模块（不触发包的 __init__，避免依赖 Home Assistant）"""
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [str(PACKAGE_DIR)]
+        sys.modules[PACKAGE] = package
+    spec = importlib.util.spec_from_file_location(f"{PACKAGE}.{name}", PACKAGE_DIR / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_registry(device_count, rng):
+    """生成合成注册表 [(设备, [实体])]"""
+    registry = []
+    for index in range(device_count):
+        device = types.SimpleNamespace(
+            id=f"device_{index}",
+            manufacturer=rng.choice(MANUFACTURERS),
+            model=rng.choice(MODELS)
+        )
+        entities = []
+        for entity_index in range(rng.randint(1, 6)):
+            domain, device_classes, features = rng.choice(ENTITY_KINDS)
+            device_class = rng.choice(device_classes)
+            entities.append(types.SimpleNamespace(
+                entity_id=f"{domain}.device_{index}_{device_class or 'entity'}_{entity_index}",
+                domain=domain,
+                device_class=None,
+                original_device_class=device_class,
+                supported_features=rng.choice(features),
+                disabled_by="user" if rng.random() < 0.05 else None
+            ))
+        registry.append((device, entities))
+    return registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=5000, help="合成设备数量")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    classifier_module = _load_module("device_classifier")
+    registry = build_registry(args.devices, random.Random(args.seed))
+    entity_count = sum(len(entities) for _, entities in registry)
+
+    start = time.perf_counter()
+    classifier = classifier_module.DeviceClassifier()
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        results = [classifier.classify_device(device, entities) for device, entities in registry]
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    primary = Counter(roles[0] for roles in results)
+    multi_role = sum(1 for roles in results if len(roles) > 1)
+
+    print(f"设备: {args.devices}  实体: {entity_count}  规则编译: {compile_ms:.2f} ms")
+    print(f"批量分类: 最快 {best * 1000:.1f} ms  中位 {statistics.median(timings) * 1000:.1f} ms"
+          f"  ({args.devices / best:,.0f} 设备/秒, {best / args.devices * 1e6:.2f} µs/设备)")
+    print(f"多角色设备: {multi_role}  主角色分布: {dict(primary.most_common())}")
+
+
+if __name__ == "__main__":
+    main()
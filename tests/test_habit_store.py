@@ -0,0 +1,35 @@
+"""习惯存储近似匹配测试"""
+from unittest.mock import MagicMock
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.deepseek_ai.habit_store import HabitStore  # noqa: E402
+
+HOUR = "20"
+ACTION = {"service": "light.turn_on", "entity_id": "light.living_room"}
+
+
+@pytest.fixture
+def store():
+    habit_store = HabitStore(MagicMock())
+    habit_store._schedule_save = lambda: None
+    return habit_store
+
+
+@pytest.mark.parametrize("learned, command", [
+    ("打开客厅所有灯", "关闭客厅所有灯"),
+    ("关闭卧室的灯", "打开卧室的灯"),
+    ("把空调调到26度", "把空调调到25度"),
+    ("空调温度升高两度", "空调温度降低两度"),
+])
+def test_opposite_or_different_setpoint_not_matched(store, learned, command):
+    store.learn(learned, HOUR, ACTION)
+    assert store.lookup(command, HOUR) is None
+
+
+def test_near_duplicate_matched(store):
+    store.learn("麻烦打开客厅所有的灯", HOUR, ACTION)
+    assert store.lookup("打开客厅所有灯光", HOUR) == ACTION
+